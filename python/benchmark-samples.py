@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+benchmark-samples.py
+
+Benchmarks the WAV processing scripts against a reproducible synthetic sample library.
+
+The program:
+  1. Generates a sample library from a seed (the same seed always gives byte-identical files) covering
+     mono/stereo, 16/24/32-bit integer and 32-bit float PCM at 44.1, 48 and 96 kHz, with and without
+     'smpl' loop chunks, with and without 'cue ' points and 'LIST' (INFO and adtl label) chunks, some
+     before the audio data and some after it, pitched names (e.g. 'Inst_C#3.wav'), MIDI offset names (e.g. 'Str_8-up_E3.wav'),
+     an SFZ file per instrument and a few non-wav files.
+  2. Runs each script on the library (fresh output folders every run) and times it: wall time, CPU time
+     of the script and its child processes (Rubberband, SoX), and the peak memory of the largest of
+     them, measured for that run alone.
+  3. Stores the results as JSON, and optionally compares them with an earlier results file.
+
+Usage:
+    python benchmark-samples.py WORK_DIR [--seed 1] [--duration 2] [--repeat 3] [--output results.json]
+    python benchmark-samples.py WORK_DIR --scripts copyAndExtendSamples create-lite-samples --compare before.json
+"""
+
+import os                # For file system operations.
+import sys               # For the interpreter running the scripts.
+import time              # For wall-clock timing.
+import json              # For the results file.
+import shutil            # For clearing output folders.
+import struct            # For writing 'smpl' chunks.
+import argparse          # For command-line argument parsing.
+import platform          # For describing the machine in the results.
+import statistics        # For medians over repeated runs.
+import subprocess        # For running the scripts.
+import itertools         # For the combinations of sample formats.
+from datetime import datetime, timezone
+
+import numpy as np       # For generating the audio.
+import soundfile as sf   # For writing the WAV files.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# === Synthetic Library ===========================================
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+CHANNELS = (1, 2)
+SUBTYPES = ('PCM_16', 'PCM_24', 'PCM_32', 'FLOAT')
+SAMPLE_RATES = (44100, 48000, 96000)
+# Notes recorded for every pitched instrument; the gaps are filled by the pitch-shifting scripts.
+PITCHED_NOTES = (48, 49, 52)       # C3, C#3, E3
+# Note range passed to the pitch-shifting scripts.
+NOTE_RANGE = 'G#2-F3'
+# Version of the library layout: a library generated by another version is not reused.
+LIBRARY_VERSION = 2
+
+def midi_to_note_name(midi):
+    """
+    Convert a MIDI note number to a note name string (MIDI 60 is C4).
+    """
+    return f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}"
+
+def synth_tone(rng, midi, sr, frames, channels):
+    """
+    Return a decaying harmonic tone at the pitch of midi with a little noise, as float32 in [-1, 1].
+    """
+    t = np.arange(frames) / sr
+    freq = 440.0 * 2 ** ((midi - 69) / 12)
+    tone = sum(np.sin(2 * np.pi * freq * k * t + rng.uniform(0, 2 * np.pi)) / k for k in (1, 2, 3))
+    tone *= 0.4 * np.exp(-1.5 * t)
+    y = np.stack([tone] * channels, axis=1) + rng.normal(0, 0.002, (frames, channels))
+    return np.clip(y, -1.0, 1.0).astype(np.float32)
+
+def riff_chunk(chunk_id, payload):
+    """
+    Return a RIFF chunk: its id, size and payload, padded to an even number of bytes.
+    """
+    return chunk_id + struct.pack('<I', len(payload)) + payload + b'\0' * (len(payload) & 1)
+
+def smpl_chunk(sr, loop_start, loop_end):
+    """
+    Return a 'smpl' chunk with a single forward loop.
+    """
+    payload = struct.pack('<9I', 0, 0, int(1e9 / sr), 60, 0, 0, 0, 1, 0)
+    payload += struct.pack('<6I', 0, 0, loop_start, loop_end, 0, 0)
+    return riff_chunk(b'smpl', payload)
+
+def cue_chunks(name, positions):
+    """
+    Return a 'cue ' chunk with a cue point at each frame position and a 'LIST' 'adtl' chunk labelling them.
+    """
+    cue = struct.pack('<I', len(positions))
+    labels = b'adtl'
+    for cue_id, position in enumerate(positions, 1):
+        cue += struct.pack('<II4sIII', cue_id, position, b'data', 0, 0, position)
+        labels += riff_chunk(b'labl', struct.pack('<I', cue_id) + f"{name} {cue_id}".encode() + b'\0')
+    return riff_chunk(b'cue ', cue) + riff_chunk(b'LIST', labels)
+
+def info_chunk(name):
+    """
+    Return a 'LIST' 'INFO' chunk naming the sample.
+    """
+    return riff_chunk(b'LIST', b'INFO' + riff_chunk(b'INAM', name.encode() + b'\0'))
+
+def insert_chunks(path, before_data=b'', after_data=b''):
+    """
+    Insert chunks into a WAV file right before and after its 'data' chunk and fix up the RIFF size.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_size = struct.unpack('<I', data[pos+4:pos+8])[0]
+        if data[pos:pos+4] == b'data':
+            break
+        pos += 8 + chunk_size + (chunk_size & 1)
+    end = pos + 8 + chunk_size
+    # An odd-sized data chunk is followed by a pad byte, which the new chunks go after.
+    pad = b'\0' * (chunk_size & 1)
+    data = data[:pos] + before_data + data[pos:end] + pad + after_data + data[end + len(pad):]
+    with open(path, 'wb') as f:
+        f.write(data[:4] + struct.pack('<I', len(data) - 8) + data[8:])
+
+def clear_peak_timestamp(path):
+    """
+    Zero the time stamp libsndfile puts in the 'PEAK' chunk of float files, so the same seed
+    always gives byte-identical files.
+    """
+    with open(path, 'r+b') as f:
+        data = f.read()
+        pos = 12
+        while pos + 8 <= len(data):
+            chunk_id = data[pos:pos+4]
+            chunk_size = struct.unpack('<I', data[pos+4:pos+8])[0]
+            if chunk_id == b'PEAK':
+                f.seek(pos + 12)
+                f.write(b'\0\0\0\0')
+                return
+            pos += 8 + chunk_size + (chunk_size & 1)
+
+def write_sample(path, y, sr, subtype, looped, tagged=False):
+    """
+    Write one synthetic sample, with a loop over its middle half if looped.
+
+    A tagged sample also gets a 'LIST' 'INFO' chunk before its audio data, and cue points (with their
+    'LIST' 'adtl' labels) at a quarter and at half of its length after it.
+    """
+    sf.write(path, y, sr, subtype=subtype)
+    if subtype == 'FLOAT':
+        clear_peak_timestamp(path)
+    before_data = after_data = b''
+    if tagged:
+        name = os.path.splitext(os.path.basename(path))[0]
+        before_data = info_chunk(name)
+        after_data = cue_chunks(name, [len(y) // 4, len(y) // 2])
+    if looped:
+        after_data += smpl_chunk(sr, len(y) // 4, 3 * len(y) // 4)
+    if before_data or after_data:
+        insert_chunks(path, before_data, after_data)
+
+def generate_library(library_root, seed, duration):
+    """
+    Generate the synthetic library under library_root and return a description of it.
+
+    One instrument is made for every combination of channel count, sample format and sample rate;
+    every other instrument has loop points, and every third one cue points and 'LIST' chunks (so some
+    have both). Each gets pitched notes, an offset-named note, an SFZ
+    file mapping its samples, and a loose unpitched hit.
+    """
+    rng = np.random.default_rng(seed)
+    files = 0
+    for index, (channels, subtype, sr) in enumerate(itertools.product(CHANNELS, SUBTYPES, SAMPLE_RATES)):
+        looped = index % 2 == 0
+        tagged = index % 3 == 0
+        name = f"{'stereo' if channels == 2 else 'mono'}_{subtype.lower()}_{sr // 1000}k"
+        folder = os.path.join(library_root, name)
+        os.makedirs(folder, exist_ok=True)
+        frames = int(duration * sr)
+        regions = []
+        for midi in PITCHED_NOTES:
+            fname = f"Inst_{midi_to_note_name(midi)}.wav"
+            write_sample(os.path.join(folder, fname), synth_tone(rng, midi, sr, frames, channels),
+                         sr, subtype, looped, tagged)
+            regions.append((fname, midi))
+        # An 8-up name: the file holds E3, recorded for a key eight semitones lower.
+        fname = "Str_8-up_E3.wav"
+        write_sample(os.path.join(folder, fname), synth_tone(rng, 52, sr, frames, channels),
+                     sr, subtype, looped, tagged)
+        regions.append((fname, 44))
+        write_sample(os.path.join(folder, "hit.wav"), synth_tone(rng, 60, sr, frames // 4, channels),
+                     sr, subtype, False, tagged)
+        with open(os.path.join(folder, f"{name}.sfz"), 'w', encoding='utf-8') as f:
+            for fname, midi in regions:
+                f.write(f"<region> sample={fname} key={midi}\n")
+        with open(os.path.join(folder, "readme.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"Synthetic {name} instrument (seed {seed}).\n")
+        files += 5
+    total_bytes = sum(os.path.getsize(os.path.join(dirpath, fname))
+                      for dirpath, _, filenames in os.walk(library_root) for fname in filenames)
+    return {'version': LIBRARY_VERSION, 'seed': seed, 'duration_seconds': duration, 'wav_files': files,
+            'bytes': total_bytes,
+            'channels': list(CHANNELS), 'subtypes': list(SUBTYPES), 'sample_rates': list(SAMPLE_RATES),
+            'note_range': NOTE_RANGE}
+
+# === Scripts Under Test ==========================================
+def release_folder(library_root, scratch_root):
+    """
+    Copy every looped sample into one flat folder, since extract-release-samples.py works on a
+    single folder and writes its output next to the input.
+    """
+    os.makedirs(scratch_root, exist_ok=True)
+    for dirpath, _, filenames in os.walk(library_root):
+        for fname in sorted(filenames):
+            if fname.startswith('Inst_') and fname.endswith('.wav'):
+                shutil.copy2(os.path.join(dirpath, fname),
+                             os.path.join(scratch_root, f"{os.path.basename(dirpath)}_{fname}"))
+    return scratch_root
+
+# Command line of each script, given the library and a fresh output folder.
+SCRIPTS = {
+    'copyAndExtendSamples': lambda lib, out: ['copyAndExtendSamples.py', lib, os.path.join(out, 'stereo'),
+                                              os.path.join(out, 'mono'), '--note-range', NOTE_RANGE,
+                                              '--seed', '1'],
+    'convert-samples': lambda lib, out: ['convert-samples.py', lib, out, NOTE_RANGE],
+    'create-lite-samples': lambda lib, out: ['create-lite-samples.py', lib, out, '-r'],
+    'full-lite-workflow': lambda lib, out: ['full-lite-workflow.py', lib, out, '-r'],
+    # The lite build with its resampling tier, to weigh the resampling against the output it saves.
+    'full-lite-workflow-44k': lambda lib, out: ['full-lite-workflow.py', lib, out, '-r', '--target-rate', '44100'],
+    'full-lite-workflow-22k': lambda lib, out: ['full-lite-workflow.py', lib, out, '-r', '--target-rate', '22050'],
+    'extract-release-samples': lambda lib, out: ['extract-release-samples.py',
+                                                 release_folder(lib, os.path.join(out, 'release'))],
+}
+
+def run_script(name, library_root, output_root, log_path):
+    """
+    Run one script on the library into a fresh output folder and return its measurements.
+    """
+    if os.path.exists(output_root):
+        shutil.rmtree(output_root)
+    os.makedirs(output_root)
+    script, *args = SCRIPTS[name](library_root, output_root)
+    cmd = [sys.executable, os.path.join(SCRIPT_DIR, script)] + args
+    start = time.perf_counter()
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 gives the usage of this script and the processes it waited for, and nothing else:
+        # CPU time summed over them, ru_maxrss the peak of the largest one (in KB on Linux).
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    output_bytes = sum(os.path.getsize(os.path.join(dirpath, fname))
+                       for dirpath, _, filenames in os.walk(output_root) for fname in filenames)
+    return {'returncode': process.returncode, 'wall_seconds': wall,
+            'cpu_seconds': usage.ru_utime + usage.ru_stime, 'peak_rss_kb': usage.ru_maxrss,
+            'output_bytes': output_bytes}
+
+def summarize(runs):
+    """
+    Return the median and minimum wall and CPU time, the median peak memory and the output size of the
+    successful runs.
+    """
+    ok = [run for run in runs if run['returncode'] == 0]
+    if not ok:
+        return {'status': 'failed'}
+    return {'status': 'ok',
+            'median_wall_seconds': statistics.median(run['wall_seconds'] for run in ok),
+            'min_wall_seconds': min(run['wall_seconds'] for run in ok),
+            'median_cpu_seconds': statistics.median(run['cpu_seconds'] for run in ok),
+            'median_peak_rss_kb': statistics.median(run['peak_rss_kb'] for run in ok),
+            'output_bytes': ok[-1]['output_bytes']}
+
+# === Reporting ===================================================
+def print_results(results, baseline=None):
+    """
+    Print a table of the median times and peak memory, the throughput over the library and the output
+    size, with the change against baseline results if given.
+    """
+    header = f"{'Script':<26} {'Status':<7} {'Wall s':>8} {'CPU s':>8} {'Peak MB':>8} {'In MB/s':>8} {'Out MB':>8}"
+    if baseline:
+        header += f" {'Before s':>9} {'Change':>8}"
+    print(header)
+    for name, result in results['scripts'].items():
+        summary = result['summary']
+        if summary['status'] != 'ok':
+            print(f"{name:<26} {'failed':<7} (see {result['log']})")
+            continue
+        throughput = results['library']['bytes'] / 1e6 / summary['median_wall_seconds']
+        line = (f"{name:<26} {'ok':<7} {summary['median_wall_seconds']:>8.2f} {summary['median_cpu_seconds']:>8.2f} "
+                f"{summary.get('median_peak_rss_kb', 0) / 1024:>8.1f} {throughput:>8.1f} {summary.get('output_bytes', 0) / 1e6:>8.1f}")
+        before = (baseline or {}).get('scripts', {}).get(name, {}).get('summary', {})
+        if baseline and before.get('status') == 'ok':
+            change = summary['median_wall_seconds'] / before['median_wall_seconds'] - 1
+            line += f" {before['median_wall_seconds']:>9.2f} {change:>+8.1%}"
+        print(line)
+    if baseline and baseline.get('library') != results['library']:
+        print("Note: the baseline was measured on a different synthetic library.")
+
+# === Main ========================================================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a reproducible synthetic sample library and time the WAV processing scripts on it.")
+    parser.add_argument("work_dir", help="Folder for the generated library, the script outputs and the logs")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic library")
+    parser.add_argument("--duration", type=float, default=2.0, help="Length of each pitched sample in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs of each script")
+    parser.add_argument("--scripts", nargs='+', choices=sorted(SCRIPTS), default=list(SCRIPTS),
+                        help="Scripts to benchmark (default: all)")
+    parser.add_argument("--output", help="Results file (default: WORK_DIR/results-<timestamp>.json)")
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    library_root = os.path.join(args.work_dir, 'library')
+    spec_path = os.path.join(args.work_dir, 'library.json')
+    spec = {'version': LIBRARY_VERSION, 'seed': args.seed, 'duration_seconds': args.duration}
+    existing = None
+    if os.path.exists(spec_path):
+        with open(spec_path, encoding='utf-8') as f:
+            existing = json.load(f)
+    if existing and all(existing.get(key) == value for key, value in spec.items()):
+        library = existing
+        print(f"Reusing synthetic library in '{library_root}'.")
+    else:
+        if os.path.exists(library_root):
+            shutil.rmtree(library_root)
+        print(f"Generating synthetic library in '{library_root}'...")
+        library = generate_library(library_root, args.seed, args.duration)
+        with open(spec_path, 'w', encoding='utf-8') as f:
+            json.dump(library, f, indent=2)
+    print(f"{library['wav_files']} WAV files, {library['bytes'] / 1e6:.1f} MB.")
+
+    results = {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'platform': platform.platform(),
+               'cpu_count': os.cpu_count(), 'library': library, 'scripts': {}}
+    for name in args.scripts:
+        runs = []
+        log_path = os.path.join(args.work_dir, f"{name}.log")
+        for i in range(args.repeat):
+            run = run_script(name, library_root, os.path.join(args.work_dir, 'output', name), log_path)
+            runs.append(run)
+            print(f"{name} run {i + 1}/{args.repeat}: {run['wall_seconds']:.2f} s"
+                  + (f" (exit code {run['returncode']}, see {log_path})" if run['returncode'] else ''))
+            if run['returncode']:
+                break
+        results['scripts'][name] = {'runs': runs, 'summary': summarize(runs), 'log': log_path}
+
+    output = args.output or os.path.join(
+        args.work_dir, f"results-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print()
+    print_results(results, baseline)
+    print(f"\nResults written to '{output}'.")
+
+if __name__ == "__main__":
+    main()
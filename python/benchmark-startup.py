@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+benchmark-startup.py
+
+Measures the cold-start time of the command-line scripts and guards it against regressions.
+
+Every entry point is started in a fresh interpreter with -X importtime, either with --help (scripts
+with a command line) or by loading the module without running it (scripts without one, which would
+otherwise start trading). For each one the program records:
+  - the wall time of the whole start, median over the repeated runs;
+  - the import time reported by the interpreter, and the slowest top-level imports;
+  - any heavy dependency (librosa, music21, pandas, alpaca_trade_api, scipy) loaded on that path,
+    which should only be imported by the code that needs it.
+
+The run fails (exit code 1) if an entry point fails to start or loads a heavy dependency, if a median
+start is slower than --budget-ms, or, with --compare, if it is more than --tolerance slower than the
+earlier results.
+
+Usage:
+    python benchmark-startup.py [--repeat 5] [--output startup.json]
+    python benchmark-startup.py --compare startup.json [--tolerance 0.25] [--budget-ms 1000]
+"""
+
+import os                # For file paths.
+import sys               # For the interpreter running the scripts.
+import time              # For wall-clock timing.
+import json              # For the results file.
+import argparse          # For command-line argument parsing.
+import platform          # For describing the machine in the results.
+import statistics        # For medians over repeated runs.
+import subprocess        # For starting the scripts.
+from datetime import datetime, timezone
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entry points and how they are started: 'help' runs the script with --help, 'import' only loads it.
+ENTRY_POINTS = {
+    'convert-samples': 'help',
+    'copyAndExtendSamples': 'help',
+    'create-lite-samples': 'help',
+    'full-lite-workflow': 'help',
+    'harmonize_melody': 'help',
+    'trading-bot_02': 'import',
+    'trading-app-2_gpt-o1': 'import',
+}
+# Dependencies that take long to import and must not be loaded just to start.
+HEAVY_MODULES = ('librosa', 'music21', 'pandas', 'alpaca_trade_api', 'scipy')
+# Number of slowest top-level imports kept per entry point.
+TOP_IMPORTS = 5
+
+# Loads a script as a module named 'startup_probe', so its `if __name__ == "__main__"` block does not run.
+IMPORT_PROBE = ("import importlib.util, sys; "
+                "spec = importlib.util.spec_from_file_location('startup_probe', sys.argv[1]); "
+                "spec.loader.exec_module(importlib.util.module_from_spec(spec))")
+
+def start_command(name):
+    """
+    Return the command starting an entry point under -X importtime.
+    """
+    path = os.path.join(SCRIPT_DIR, f"{name}.py")
+    if ENTRY_POINTS[name] == 'help':
+        return [sys.executable, '-X', 'importtime', path, '--help']
+    return [sys.executable, '-X', 'importtime', '-c', IMPORT_PROBE, path]
+
+def parse_importtime(stderr):
+    """
+    Parse the -X importtime report into (total_import_ms, top-level imports as {module: cumulative_ms}).
+    """
+    total_us = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+        total_us += int(self_us)
+        # Nested imports are indented below the module that imported them.
+        if not module[1:].startswith(' '):
+            top_level[module.strip()] = int(cumulative_us) / 1000
+    return total_us / 1000, top_level
+
+def measure(name):
+    """
+    Start an entry point once and return its measurements.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(start_command(name), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            cwd=SCRIPT_DIR, text=True, errors='replace')
+    wall_ms = (time.perf_counter() - start) * 1000
+    import_ms, top_level = parse_importtime(result.stderr)
+    heavy = sorted(module for module in top_level if module.split('.')[0] in HEAVY_MODULES)
+    errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+    return {'returncode': result.returncode, 'wall_ms': wall_ms, 'import_ms': import_ms,
+            'top_imports': dict(sorted(top_level.items(), key=lambda item: -item[1])[:TOP_IMPORTS]),
+            'heavy_imports': heavy, 'error': errors[-1] if result.returncode and errors else None}
+
+def summarize(runs):
+    """
+    Return the medians of the runs and what the last one imported.
+    """
+    last = runs[-1]
+    return {'status': 'ok' if last['returncode'] == 0 else 'failed',
+            'median_wall_ms': statistics.median(run['wall_ms'] for run in runs),
+            'median_import_ms': statistics.median(run['import_ms'] for run in runs),
+            'top_imports': last['top_imports'], 'heavy_imports': last['heavy_imports'], 'error': last['error']}
+
+# === Guard and Reporting =========================================
+def check(results, baseline, budget_ms, tolerance):
+    """
+    Return the list of problems that fail the run.
+    """
+    problems = []
+    for name, summary in results['entry_points'].items():
+        if summary['status'] != 'ok':
+            problems.append(f"{name} failed to start: {summary['error']}")
+        if summary['heavy_imports']:
+            problems.append(f"{name} imports {', '.join(summary['heavy_imports'])} at start")
+        if budget_ms and summary['median_wall_ms'] > budget_ms:
+            problems.append(f"{name} starts in {summary['median_wall_ms']:.0f} ms (budget {budget_ms:.0f} ms)")
+        before = (baseline or {}).get('entry_points', {}).get(name)
+        if before and summary['median_wall_ms'] > before['median_wall_ms'] * (1 + tolerance):
+            problems.append(f"{name} starts in {summary['median_wall_ms']:.0f} ms, "
+                            f"{before['median_wall_ms']:.0f} ms before")
+    return problems
+
+def print_results(results, baseline=None):
+    """
+    Print a table of the median start times, with the change against baseline results if given.
+    """
+    header = f"{'Entry point':<22} {'Status':<7} {'Start ms':>9} {'Import ms':>10}"
+    if baseline:
+        header += f" {'Before ms':>10} {'Change':>8}"
+    print(header + "  Slowest imports")
+    for name, summary in results['entry_points'].items():
+        line = (f"{name:<22} {summary['status']:<7} {summary['median_wall_ms']:>9.0f} "
+                f"{summary['median_import_ms']:>10.0f}")
+        before = (baseline or {}).get('entry_points', {}).get(name)
+        if baseline:
+            if before:
+                change = summary['median_wall_ms'] / before['median_wall_ms'] - 1
+                line += f" {before['median_wall_ms']:>10.0f} {change:>+8.1%}"
+            else:
+                line += f" {'-':>10} {'-':>8}"
+        line += "  " + ', '.join(f"{module} {ms:.0f}" for module, ms in summary['top_imports'].items())
+        print(line)
+        if summary['error']:
+            print(f"{'':<22} {summary['error']}")
+
+# === Main ========================================================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the cold start of the command-line scripts and fail on heavy imports or regressions.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed starts of each entry point")
+    parser.add_argument("--entry-points", nargs='+', choices=sorted(ENTRY_POINTS), default=list(ENTRY_POINTS),
+                        help="Entry points to measure (default: all)")
+    parser.add_argument("--output", help="Results file (default: none)")
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against --compare before failing (default: 0.25, i.e. 25%%)")
+    parser.add_argument("--budget-ms", type=float, help="Fail if a median start takes longer than this")
+    args = parser.parse_args()
+
+    results = {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'platform': platform.platform(), 'entry_points': {}}
+    for name in args.entry_points:
+        runs = [measure(name) for _ in range(args.repeat)]
+        results['entry_points'][name] = summarize(runs)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        print(f"\nResults written to '{args.output}'.")
+
+    problems = check(results, baseline, args.budget_ms, args.tolerance)
+    if problems:
+        print("\nStartup check failed:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
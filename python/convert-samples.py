@@ -12,21 +12,63 @@ name) the program:
   4. Checks, given a note range (e.g. C1–F4) passed on the command line, which notes are missing.
   5. For each missing note, creates a new sample by pitch shifting from the nearest available sample.
   
+Missing notes generated from the same sample share one analysis (STFT) of that sample; only the
+phase vocoding and resampling are done per note, optionally on several threads (--threads).
+
+Files are decoded with soundfile and resampled to 44.1 kHz with soxr (or SciPy's polyphase resampler
+when soxr is not installed) at the quality given by --resample-quality; files already at 44.1 kHz are
+not resampled. Decoded sources are kept for the rest of the run, keyed by path and modification time.
+
 Usage:
-    python sample_processor.py INPUT_ROOT OUTPUT_ROOT NOTE_RANGE
+    python sample_processor.py INPUT_ROOT OUTPUT_ROOT NOTE_RANGE [--seed N] [--threads N]
+                               [--resample-quality QUALITY] [--profile REPORT]
 Example:
     python sample_processor.py /path/to/input /path/to/output C1-F4
+    python sample_processor.py /path/to/input /path/to/output C0-B5 --threads 4
+    python sample_processor.py /path/to/input /path/to/output C1-F4 --profile timings.csv
 """
 
 import os
 import re
+import math
 import argparse
 import shutil
+import collections
+import concurrent.futures
 
 import numpy as np
-import librosa
 import soundfile as sf
 
+from stage_profiler import StageProfiler
+from tpdf_dither import dither_to_pcm16, file_rng
+
+# Per-stage timings, recorded only with --profile.
+PROFILER = StageProfiler()
+# Seed for the dither noise (None seeds every output from the OS, so every run differs).
+DITHER_SEED = None
+# Output root: the dither noise of a file is derived from its path under it.
+OUTPUT_ROOT = None
+# Number of threads synthesizing the pitch shifts of one sample.
+PITCH_THREADS = 1
+# STFT parameters of the pitch shifter (librosa.effects.pitch_shift's defaults).
+N_FFT = 2048
+HOP_LENGTH = N_FFT // 4
+# Sample rate of every output file.
+TARGET_SR = 44100
+# Resampling qualities: the soxr preset, and the Kaiser window beta of the SciPy fallback.
+# 'high' is what librosa.load used (soxr_hq).
+RESAMPLE_QUALITIES = {
+    'quick': ('QQ', 5.0),
+    'low': ('LQ', 5.0),
+    'medium': ('MQ', 6.0),
+    'high': ('HQ', 8.6),
+    'very-high': ('VHQ', 12.0),
+}
+RESAMPLE_QUALITY = 'high'
+# Decoded and resampled sources kept in memory, most recently used last.
+DECODE_CACHE_SIZE = 16
+decode_cache = collections.OrderedDict()
+
 # === Note conversion helpers =====================================
 
 def note_name_to_midi(note):
@@ -77,50 +119,149 @@ def parse_note_range(note_range_str):
 
 # === Audio processing functions ===================================
 
-def load_audio(file_path):
+def decode_audio(file_path):
     """
-    Load an audio file using librosa.
-    Force sample rate to 44100 Hz and mono conversion.
+    Decode an audio file to float32 mono at its own sample rate.
     """
-    y, sr = librosa.load(file_path, sr=44100, mono=True)
+    with PROFILER.stage('decode', file_path, bytes_read=os.path.getsize(file_path)):
+        y, sr = sf.read(file_path, dtype='float32', always_2d=True)
+        y = y.mean(axis=1, dtype=np.float32) if y.shape[1] > 1 else y[:, 0]
     return y, sr
 
-def pitch_shift(y, sr, semitones):
+def resample(y, orig_sr, target_sr=TARGET_SR, src=None):
+    """
+    Resample a float32 signal at RESAMPLE_QUALITY, with soxr if installed, otherwise with SciPy's
+    polyphase filter. A signal already at target_sr is returned as is.
+    
+    The result has ceil(len(y) * target_sr / orig_sr) samples, as with librosa.resample.
+    """
+    if orig_sr == target_sr:
+        return y
+    preset, beta = RESAMPLE_QUALITIES[RESAMPLE_QUALITY]
+    length = math.ceil(len(y) * (float(target_sr) / orig_sr))
+    with PROFILER.stage('resample', src):
+        try:
+            import soxr
+        except ImportError:
+            soxr = None
+        if soxr is not None:
+            y = soxr.resample(y, orig_sr, target_sr, quality=preset)
+        else:
+            from scipy.signal import resample_poly
+            g = math.gcd(int(orig_sr), int(target_sr))
+            y = resample_poly(y, int(target_sr) // g, int(orig_sr) // g, window=('kaiser', beta))
+        if len(y) < length:
+            y = np.pad(y, (0, length - len(y)))
+        return y[:length].astype(np.float32, copy=False)
+
+def load_audio(file_path):
+    """
+    Load an audio file as float32 mono at 44100 Hz.
+    
+    The result is kept for the rest of the run (up to DECODE_CACHE_SIZE files) and returned again
+    while the file's modification time and size stay the same. It is read-only, as it may be shared.
+    """
+    st = os.stat(file_path)
+    key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+    cached = decode_cache.get(key)
+    if cached is not None:
+        decode_cache.move_to_end(key)
+        return cached
+    y, sr = decode_audio(file_path)
+    y = resample(y, sr, TARGET_SR, file_path)
+    y.flags.writeable = False
+    decode_cache[key] = (y, TARGET_SR)
+    if len(decode_cache) > DECODE_CACHE_SIZE:
+        decode_cache.popitem(last=False)
+    return y, TARGET_SR
+
+def analyse(y):
+    """
+    Return the STFT of a signal, to be shared by every pitch shift made from it.
+    """
+    import librosa  # Imported on first use: it takes seconds to load, which --help should not pay.
+    return librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+def synthesize_shift(y, sr, stft, semitones):
+    """
+    Pitch shift y by a number of semitones, starting from its STFT.
+    
+    Does what librosa.effects.pitch_shift does after its analysis step: time-stretch by phase
+    vocoding, resynthesize, and resample back to the original length, so the result is the same.
+    """
+    import librosa
+    if semitones == 0:
+        return y
+    rate = 2.0 ** (-semitones / 12)
+    stretched = librosa.phase_vocoder(stft, rate=rate, hop_length=HOP_LENGTH)
+    y_stretched = librosa.istft(stretched, hop_length=HOP_LENGTH, dtype=y.dtype,
+                                length=int(round(len(y) / rate)))
+    y_shifted = librosa.resample(y_stretched, orig_sr=float(sr) / rate, target_sr=sr)
+    return librosa.util.fix_length(y_shifted, size=len(y))
+
+def iter_pitch_shifts(y, sr, semitone_list, src=None):
     """
-    Pitch shift an audio signal by a number of semitones.
+    Yield (y pitch shifted, None) for each number of semitones in semitone_list, in order, or
+    (None, exception) for a shift that failed, so one failure does not stop the others.
+    
+    y is analysed once for all of them; an error analysing it is raised. With PITCH_THREADS > 1 the shifts are synthesized on a
+    thread pool, at most two per thread ahead of the caller, so only a few are held in memory.
     """
-    return librosa.effects.pitch_shift(y, sr, n_steps=semitones)
+    with PROFILER.stage('pitch_analysis', src):
+        stft = analyse(y)
+
+    def shift(semitones):
+        try:
+            with PROFILER.stage('pitch_shift', src):
+                return synthesize_shift(y, sr, stft, semitones), None
+        except Exception as e:
+            return None, e
 
-def process_audio(y, sr):
+    if PITCH_THREADS <= 1:
+        for semitones in semitone_list:
+            yield shift(semitones)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=PITCH_THREADS) as executor:
+        pending = collections.deque()
+        for semitones in semitone_list:
+            pending.append(executor.submit(shift, semitones))
+            if len(pending) >= 2 * PITCH_THREADS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def process_audio(y, sr, dst):
     """
     Process an audio array:
-      - Apply high-quality dithering (TPDF dithering) before quantizing to 16-bit.
-      - Clip the values to the valid range [-1, 1].
+      - Apply high-quality dithering (TPDF dithering) while quantizing to 16-bit.
+      - Clip the values to the valid 16-bit range.
     The audio is assumed to be in float32 format with values in [-1, 1].
+    The noise generator is derived from DITHER_SEED and the path of dst under OUTPUT_ROOT.
+    Returns the samples as int16.
     """
-    # For 16-bit PCM the smallest step is 1/32768.
-    LSB = 1.0 / 32768
-    # Generate two independent uniform noises in [-LSB/2, LSB/2] and sum them.
-    dither = (np.random.uniform(-LSB/2, LSB/2, size=y.shape) +
-              np.random.uniform(-LSB/2, LSB/2, size=y.shape))
-    y_dithered = y + dither
-    # Ensure no clipping
-    y_dithered = np.clip(y_dithered, -1.0, 1.0)
-    return y_dithered
+    return dither_to_pcm16(y, file_rng(DITHER_SEED, dst, root=OUTPUT_ROOT))
 
 def save_audio(y, sr, dst):
     """
-    Save an audio array to a file in 16-bit PCM format.
+    Save 16-bit samples to a file in 16-bit PCM format.
     """
-    sf.write(dst, y, sr, subtype='PCM_16')
+    with PROFILER.stage('encode', dst, bytes_written=y.size * 2):
+        sf.write(dst, y, sr, subtype='PCM_16')
+
+def save_processed(y, sr, dst):
+    """
+    Dither decoded or generated audio to 16-bit and write it out.
+    """
+    with PROFILER.stage('dither', dst):
+        y_processed = process_audio(y, sr, dst)
+    save_audio(y_processed, sr, dst)
 
 def process_and_copy_file(src, dst):
     """
     Load a wav file, process it (resample, mono, dither), and write it out.
     """
     y, sr = load_audio(src)
-    y_processed = process_audio(y, sr)
-    save_audio(y_processed, sr, dst)
+    save_processed(y, sr, dst)
 
 # === Directory traversal and sample-set processing =============
 
@@ -140,7 +281,7 @@ def process_directory(input_root, output_root, note_range_midi):
     # Example: "snare_C4.wav" or "kick_A#3.wav"
     pattern = re.compile(r'^(.*)_([A-G][#]?\d)\.wav$', re.IGNORECASE)
 
-    for dirpath, dirnames, filenames in os.walk(input_root):
+    for dirpath, dirnames, filenames in PROFILER.iterate('walk', os.walk(input_root), input_root):
         # Compute the relative directory path and re-create it under the output root.
         rel_dir = os.path.relpath(dirpath, input_root)
         out_dir = os.path.join(output_root, rel_dir)
@@ -151,7 +292,9 @@ def process_directory(input_root, output_root, note_range_midi):
             if not fname.lower().endswith('.wav'):
                 src_file = os.path.join(dirpath, fname)
                 dst_file = os.path.join(out_dir, fname)
-                shutil.copy2(src_file, dst_file)
+                size = os.path.getsize(src_file)
+                with PROFILER.stage('copy', dst_file, bytes_read=size, bytes_written=size):
+                    shutil.copy2(src_file, dst_file)
 
         # Group wav files by “sample set” (base name without the note part).
         sample_sets = {}
@@ -184,40 +327,42 @@ def process_directory(input_root, output_root, note_range_midi):
 
         # Now process each sample set.
         for base, samples in sample_sets.items():
-            # Determine which MIDI notes in the given range are missing.
+            # Determine which MIDI notes in the given range are missing, and group them by the
+            # available sample with the minimal semitone distance, which they are generated from.
             missing_midis = [m for m in note_range_midi if m not in samples]
-            # Process and copy the original samples.
+            targets = {midi_val: [] for midi_val in samples}
+            for target_midi in missing_midis:
+                nearest_midi = min(samples.keys(), key=lambda m: abs(m - target_midi))
+                targets[nearest_midi].append(target_midi)
             for midi_val, src in samples.items():
+                # Process and copy the original sample.
                 target_note = midi_to_note_name(midi_val)
                 new_fname = f"{base}_{target_note}.wav"
                 dst = os.path.join(out_dir, new_fname)
-                process_and_copy_file(src, dst)
-            # For each missing note, generate a new sample by pitch shifting
-            # from the nearest available sample.
-            for target_midi in missing_midis:
-                # Find the available sample with the minimal semitone distance.
-                nearest_midi = min(samples.keys(), key=lambda m: abs(m - target_midi))
-                src = samples[nearest_midi]
+                y, sr = load_audio(src)
+                save_processed(y, sr, dst)
+                if not targets[midi_val]:
+                    continue
+                # Generate the missing notes nearest to it from the same decoded audio and analysis.
+                semitone_list = [target_midi - midi_val for target_midi in targets[midi_val]]
+                shifted = zip(targets[midi_val], iter_pitch_shifts(y, sr, semitone_list, src))
                 try:
-                    y, sr = load_audio(src)
+                    for target_midi, (y_shifted, error) in shifted:
+                        target_note = midi_to_note_name(target_midi)
+                        if error is not None:
+                            print(f"Error pitch shifting '{src}' to {target_note}: {error}")
+                            continue
+                        new_fname = f"{base}_{target_note}.wav"
+                        dst = os.path.join(out_dir, new_fname)
+                        try:
+                            save_processed(y_shifted, sr, dst)
+                        except Exception as e:
+                            print(f"Error writing '{dst}': {e}")
+                            continue
+                        print(f"Generated missing sample: {dst}")
                 except Exception as e:
-                    print(f"Error loading '{src}': {e}")
-                    continue
-                semitones = target_midi - nearest_midi
-                if semitones != 0:
-                    try:
-                        y_shifted = pitch_shift(y, sr, semitones)
-                    except Exception as e:
-                        print(f"Error pitch shifting '{src}': {e}")
-                        continue
-                else:
-                    y_shifted = y
-                y_processed = process_audio(y_shifted, sr)
-                target_note = midi_to_note_name(target_midi)
-                new_fname = f"{base}_{target_note}.wav"
-                dst = os.path.join(out_dir, new_fname)
-                save_audio(y_processed, sr, dst)
-                print(f"Generated missing sample: {dst}")
+                    # The analysis shared by every shift failed.
+                    print(f"Error pitch shifting '{src}': {e}")
 
 # === Main ========================================================
 
@@ -228,6 +373,15 @@ def main():
     parser.add_argument("input_root", help="Input root directory to search for samples")
     parser.add_argument("output_root", help="Output root directory where processed samples will be written")
     parser.add_argument("note_range", help="Note range (e.g. 'C1-F4') to fill in missing notes")
+    parser.add_argument("--seed", type=int,
+                        help="Seed for the dither noise, making the output reproducible (default: random every run)")
+    parser.add_argument("--threads", type=int, default=1, metavar="N",
+                        help="Number of threads synthesizing the missing notes generated from one sample (default: 1)")
+    parser.add_argument("--resample-quality", choices=list(RESAMPLE_QUALITIES), default='high',
+                        help="Quality of the resampling to 44.1 kHz (default: high, as librosa.load)")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Time every stage (walk, decode, resample, pitch analysis, pitch shift, dither, encode) per file, write the records "
+                             "to REPORT (CSV if it ends in .csv, JSON otherwise) and print a summary.")
     args = parser.parse_args()
 
     try:
@@ -236,7 +390,17 @@ def main():
         print(f"Error parsing note range: {e}")
         return
 
+    global DITHER_SEED, OUTPUT_ROOT, PITCH_THREADS, RESAMPLE_QUALITY
+    DITHER_SEED = args.seed
+    OUTPUT_ROOT = args.output_root
+    PITCH_THREADS = args.threads
+    RESAMPLE_QUALITY = args.resample_quality
+    PROFILER.enabled = bool(args.profile)
     process_directory(args.input_root, args.output_root, note_range_midi)
+    if PROFILER.enabled:
+        PROFILER.write_report(args.profile)
+        print(PROFILER.summary())
+        print(f"Profile written to '{args.profile}'.")
 
 if __name__ == "__main__":
     main()
@@ -12,26 +12,54 @@ For pitched instruments (when a note range is provided via --note-range), the pr
   3. Determines missing notes (within the provided range) and generates new samples from the nearest candidate.
   4. Writes the processed files to the primary output folder.
   5. Additionally, mirrors the entire structure in a second folder, converting every WAV file to monaural
-     using high‑quality SoX conversion (with loop markers re‑embedded).
+     (a vectorized downmix of the audio already in memory, dithered, with loop markers re‑embedded;
+     --mono-backend sox uses SoX on the written file instead).
 
 Usage examples:
   Pitched instruments:
       python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT --note-range C1-F4 [--skip-existing]
   Non‑pitched instruments:
       python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT [--skip-existing]
+  Either mode on 8 worker processes:
+      python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT --jobs 8
+  One process overlapping reads, compute (2 threads) and writes, e.g. on network storage:
+      python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT --pipeline 2
+  Time each stage (walk, decode, pitch shift, dither, encode, smpl embed, mono) per file:
+      python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT --profile report.csv
+  Keep a job queue so an interrupted run can be picked up where it stopped (run the same command again):
+      python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT --note-range C1-F4 --resume
+  Dry run printing the job graph and its estimated cost (text or JSON):
+      python copyAndExtendSamples.py INPUT_ROOT OUTPUT_ROOT MONO_OUTPUT_ROOT --note-range C1-C7 --plan json
 """
 
 import os                # For file system operations.
+import sys               # For writing plan diagnostics to stderr.
 import re                # For regex matching of filenames.
 import argparse          # For command‑line argument parsing.
-import shutil            # For copying files.
 import subprocess        # To call external tools (Rubberband and SoX).
 import tempfile          # For temporary file creation.
 import struct            # For binary data manipulation (WAV headers).
+import io                # For capturing job output in worker processes.
+import contextlib        # For redirecting job output.
+import functools         # For binding job options to the worker function.
+import concurrent.futures  # For the optional process pool.
+import threading         # For the reader and writer threads of the I/O pipeline.
+import queue             # For the bounded queues between pipeline stages.
+import collections       # For the in-flight jobs of the pipeline.
+import hashlib           # For content hashes in the incremental build manifest.
+import json              # For serializing job signatures.
+import sqlite3           # For the incremental build manifest and the job queue.
 
 import numpy as np       # For numerical operations.
 import soundfile as sf   # For reading and writing audio files.
 
+from stage_profiler import StageProfiler  # For --profile timings.
+from tpdf_dither import TPDFDither, dither_to_pcm16, file_rng  # For dithering to 16-bit PCM.
+from link_copy import LINK_MODES, link_or_copy  # For reflinked/hard-linked copies of non-wav files.
+
+# Per-stage timings, recorded only with --profile.
+PROFILER = StageProfiler()
+
 # === Helper for safe printing =========================================
 def safe_str(s):
     """Return a safe UTF‑8 version of s, replacing surrogates with the replacement character."""
@@ -42,31 +70,60 @@ def sanitize_filename(name):
     """Replace surrogate characters with a hyphen."""
     return ''.join(c if not (0xD800 <= ord(c) <= 0xDFFF) else '-' for c in name)
 
-def sanitize_directory(dirpath, filenames):
+def resolve_sanitized_names(filenames, dirnames=()):
+    """
+    Yield (fname, new_name) for every file whose name needs sanitizing.
+    
+    If the sanitized name conflicts with another entry of the directory, a numeric suffix is added.
+    Collisions are resolved against the names already in the directory (held in memory) instead
+    of probing the disk for each candidate.
+    """
+    taken = set(filenames) | set(dirnames)
+    for fname in filenames:
+        sanitized = sanitize_filename(fname)
+        if sanitized == fname:
+            continue
+        new_name = sanitized
+        counter = 1
+        base, ext = os.path.splitext(sanitized)
+        while new_name in taken:
+            new_name = f"{base}_{counter}{ext}"
+            counter += 1
+        taken.add(new_name)
+        yield fname, new_name
+
+def sanitize_directory(dirpath, filenames, dirnames=()):
     """
     Rename any file in the directory if its name contains errant surrogate characters.
     
-    If the sanitized name conflicts with an existing file, a numeric suffix is added.
+    Returns the list of file names after renaming.
     """
     new_names = {}
-    for i, fname in enumerate(filenames):
-        sanitized = sanitize_filename(fname)
-        if sanitized != fname:
-            orig_path = os.path.join(dirpath, fname)
-            new_path = os.path.join(dirpath, sanitized)
-            counter = 1
-            base, ext = os.path.splitext(sanitized)
-            while os.path.exists(new_path):
-                new_path = os.path.join(dirpath, f"{base}_{counter}{ext}")
-                counter += 1
-            try:
-                os.rename(orig_path, new_path)
-                print(f"Renamed '{safe_str(orig_path)}' to '{safe_str(new_path)}' due to invalid characters.")
-                new_names[fname] = os.path.basename(new_path)
-                filenames[i] = os.path.basename(new_path)
-            except Exception as e:
-                print(f"Error renaming '{safe_str(orig_path)}': {e}")
-    return filenames
+    for fname, new_name in resolve_sanitized_names(filenames, dirnames):
+        orig_path = os.path.join(dirpath, fname)
+        new_path = os.path.join(dirpath, new_name)
+        try:
+            os.rename(orig_path, new_path)
+            print(f"Renamed '{safe_str(orig_path)}' to '{safe_str(new_path)}' due to invalid characters.")
+            new_names[fname] = new_name
+        except Exception as e:
+            print(f"Error renaming '{safe_str(orig_path)}': {e}")
+    return [new_names.get(fname, fname) for fname in filenames]
+
+def plan_sanitized_names(dirpath, filenames, dirnames=()):
+    """
+    Work out the names sanitize_directory would give, without renaming anything.
+    
+    Returns (new_filenames, source_names) where source_names maps each changed name back to
+    the file's current name.
+    """
+    source_names = {}
+    for fname, new_name in resolve_sanitized_names(filenames, dirnames):
+        print(f"Would rename '{safe_str(os.path.join(dirpath, fname))}' to "
+              f"'{safe_str(os.path.join(dirpath, new_name))}' due to invalid characters.")
+        source_names[new_name] = fname
+    new_names = {fname: new_name for new_name, fname in source_names.items()}
+    return [new_names.get(fname, fname) for fname in filenames], source_names
 
 # === MIDI Offset Filename Renaming Helper =========================
 def modify_filename(filename, note_range_midi=None):
@@ -123,14 +180,28 @@ def safe_sf_read(file_path, dtype='float32'):
 # === WAV Integrity Check =====================================
 def is_valid_wav(file_path):
     """
-    Verify a file is a valid WAV by checking its header.
+    Verify a file is a complete WAV: a RIFF/WAVE header whose size fits the file, a fmt chunk,
+    and a data chunk that is not cut short. Only the headers are read.
     """
     try:
         with open(file_path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
             header = f.read(12)
-        if header[0:4] != b'RIFF' or header[8:12] != b'WAVE':
-            return False
-        return True
+            if header[0:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return False
+            if 8 + struct.unpack('<I', header[4:8])[0] > file_size:
+                return False
+            have_fmt = False
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return False
+                chunk_size = struct.unpack('<I', chunk_header[4:8])[0]
+                if chunk_header[0:4] == b'fmt ':
+                    have_fmt = True
+                elif chunk_header[0:4] == b'data':
+                    return have_fmt and f.tell() + chunk_size <= file_size
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
     except Exception:
         return False
 
@@ -178,63 +249,221 @@ def parse_note_range(note_range_str):
         raise ValueError("Invalid note range: start note is higher than end note.")
     return list(range(start_midi, end_midi + 1))
 
-# === Loop Marker Helpers =========================================
-def get_loop_markers(file_path):
+# === RIFF Chunk and Loop Marker Helpers =========================
+# Metadata chunks copied unchanged from a source to its dithered copy (the sample length does not change).
+PRESERVED_CHUNKS = (b'LIST', b'inst', b'cue ', b'acid')
+
+def iter_riff_chunks(data):
     """
-    Extract loop markers from a 'smpl' chunk in the WAV file.
+    Yield (chunk_id, payload) for each chunk in the bytes of a RIFF/WAVE file.
+    
+    Payloads are memoryview slices, so walking past the audio data does not copy it.
     """
-    try:
-        encoded_path = os.fsencode(file_path)
-        with open(encoded_path, 'rb') as f:
-            data = f.read()
-        index = data.find(b'smpl')
-        if index == -1:
-            return None
-        chunk_size = struct.unpack('<I', data[index+4:index+8])[0]
-        if chunk_size < 36:
+    data = memoryview(data)
+    if data[0:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError("not a RIFF/WAVE file")
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = bytes(data[pos:pos+4])
+        chunk_size = struct.unpack('<I', data[pos+4:pos+8])[0]
+        yield chunk_id, data[pos+8:pos+8+chunk_size]
+        # Chunks are padded to an even number of bytes.
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+def parse_preserved_chunks(data):
+    """
+    Return the metadata chunks listed in PRESERVED_CHUNKS as (chunk_id, payload_bytes) pairs.
+    """
+    return [(chunk_id, bytes(payload)) for chunk_id, payload in iter_riff_chunks(data)
+            if chunk_id in PRESERVED_CHUNKS]
+
+def parse_loop_markers(data):
+    """
+    Extract loop markers from a 'smpl' chunk in the bytes of a WAV file.
+    """
+    for chunk_id, payload in iter_riff_chunks(data):
+        if chunk_id != b'smpl':
+            continue
+        if len(payload) < 36:
             return None
-        smpl_header = data[index+8:index+8+36]
-        header_values = struct.unpack('<9I', smpl_header)
+        header_values = struct.unpack('<9I', payload[0:36])
         num_loops = header_values[7]
-        loops_data = data[index+8+36: index+8+36+num_loops*24]
         loop_markers = []
         for i in range(num_loops):
-            loop_chunk = loops_data[i*24:(i+1)*24]
+            loop_chunk = payload[36+i*24:36+(i+1)*24]
+            if len(loop_chunk) < 24:
+                break
             values = struct.unpack('<6I', loop_chunk)
             start = values[2]
             end = values[3]
             loop_markers.append((start, end))
         return loop_markers if loop_markers else None
+    return None
+
+def get_loop_markers(file_path):
+    """
+    Extract loop markers from a 'smpl' chunk in the WAV file.
+    """
+    try:
+        encoded_path = os.fsencode(file_path)
+        with open(encoded_path, 'rb') as f:
+            data = f.read()
+        return parse_loop_markers(data)
     except Exception as e:
         print(f"Warning: Could not read loop markers from '{safe_str(file_path)}': {e}")
         return None
 
-def embed_loop_markers(wav_path, loop_markers, sr, orig_length, new_length):
+def read_wav_metadata(file_path):
+    """
+    Return (loop_markers, chunks) of a WAV file, seeking past its audio data instead of reading it.
+    """
+    encoded_path = os.fsencode(file_path)
+    with open(encoded_path, 'rb') as f:
+        parts = [f.read(12)]
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_size = struct.unpack('<I', chunk_header[4:8])[0]
+            padded_size = chunk_size + (chunk_size & 1)
+            if chunk_header[0:4] == b'data':
+                # Keep an empty data chunk in place of the audio so the chunk parsers still apply.
+                parts.append(b'data' + struct.pack('<I', 0))
+                f.seek(padded_size, os.SEEK_CUR)
+            else:
+                parts.append(chunk_header + f.read(padded_size))
+    data = b''.join(parts)
+    return parse_loop_markers(data), parse_preserved_chunks(data)
+
+def scale_loop_markers(loop_markers, orig_length, new_length):
+    """
+    Adjust loop marker positions proportionally when the sample length changes.
+    """
+    if not loop_markers or not orig_length:
+        return loop_markers
+    return [(int(start * new_length / orig_length), int(end * new_length / orig_length))
+            for (start, end) in loop_markers]
+
+def build_smpl_chunk(loop_markers, sr):
+    """
+    Build the payload of a 'smpl' chunk holding the given loop markers.
+    """
+    sample_period = int(1e9 / sr)
+    num_loops = len(loop_markers)
+    smpl_header = struct.pack('<9I', 0, 0, sample_period, 60, 0, 0, 0, num_loops, 0)
+    loop_data = b''
+    for i, (start, end) in enumerate(loop_markers):
+        loop_data += struct.pack('<6I', i, 0, start, end, 0, 0)
+    return smpl_header + loop_data
+
+# === Streaming WAV Writer ========================================
+# Number of frames quantized and written at a time.
+WRITE_BLOCK_FRAMES = 65536
+
+def iter_pcm16_blocks(pcm, block_frames=WRITE_BLOCK_FRAMES):
+    """
+    Yield int16 samples as little‑endian 16‑bit PCM bytes, one block of frames at a time.
+    """
+    for start in range(0, len(pcm), block_frames):
+        yield pcm[start:start+block_frames].astype('<i2', copy=False).tobytes()
+
+# Suffix of a file being written; it is renamed to its final name only once complete.
+PARTIAL_SUFFIX = '.partial'
+
+def partial_path(dst):
+    """
+    Return the temporary name dst is written under until it is complete.
+    """
+    return dst + PARTIAL_SUFFIX
+
+class WavWriter:
+    """
+    Write a 16‑bit PCM WAV in a single sequential pass.
+    
+    Every chunk size is known up front, so the RIFF header is written when the file is opened, PCM blocks
+    are streamed straight into the data chunk with write(), and close() appends the trailing chunks
+    (smpl loop markers and any preserved metadata). The file is never read back or rewritten.
+    It is written under a temporary name and renamed into place by close(), so an interrupted write
+    never leaves a truncated file under the final name; abort() discards it instead.
+    """
+    def __init__(self, dst, sr, channels, frames, chunks=()):
+        self.dst = dst
+        self.temp_path = partial_path(dst)
+        self.chunks = list(chunks)
+        block_align = channels * 2
+        self.data_size = frames * block_align
+        self.written = 0
+        fmt_chunk = struct.pack('<HHIIHH', 1, channels, sr, sr * block_align, block_align, 16)
+        riff_size = 4 + (8 + len(fmt_chunk)) + (8 + self.data_size)
+        riff_size += sum(8 + len(payload) + (len(payload) & 1) for _, payload in self.chunks)
+        self.f = open(os.fsencode(self.temp_path), 'wb')
+        self.f.write(b'RIFF' + struct.pack('<I', riff_size) + b'WAVE')
+        self.f.write(b'fmt ' + struct.pack('<I', len(fmt_chunk)) + fmt_chunk)
+        self.f.write(b'data' + struct.pack('<I', self.data_size))
+
+    def write(self, block):
+        """
+        Append a block of little‑endian 16‑bit PCM bytes to the data chunk.
+        """
+        self.f.write(block)
+        self.written += len(block)
+
+    def close(self):
+        """
+        Write the trailing chunks, close the file and move it to its final name.
+        """
+        try:
+            if self.written != self.data_size:
+                raise RuntimeError(f"wrote {self.written} bytes of audio to '{safe_str(self.dst)}', "
+                                   f"expected {self.data_size}")
+            for chunk_id, payload in self.chunks:
+                self.f.write(chunk_id + struct.pack('<I', len(payload)) + payload)
+                if len(payload) & 1:
+                    self.f.write(b'\0')
+            self.f.close()
+            os.replace(os.fsencode(self.temp_path), os.fsencode(self.dst))
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """
+        Close and delete the unfinished file.
+        """
+        self.f.close()
+        try:
+            os.remove(os.fsencode(self.temp_path))
+        except FileNotFoundError:
+            pass
+
+# Writer thread taking over the file writes when the I/O pipeline is running (see run_jobs_pipelined).
+WRITE_BEHIND = None
+
+def write_wav(dst, sr, channels, frames, pcm_blocks, chunks=()):
     """
-    Embed loop markers into the WAV file by appending a 'smpl' chunk.
-    Loop marker positions are adjusted proportionally if the sample length changes.
+    Write a 16‑bit PCM WAV from an iterable of PCM byte blocks in a single sequential pass.
+    
+    When the I/O pipeline is running, the blocks are quantized here and the file is written
+    by the pipeline's writer thread instead.
     """
+    if WRITE_BEHIND is not None:
+        WRITE_BEHIND.submit(dst, functools.partial(write_wav_now, dst, sr, channels, frames,
+                                                   list(pcm_blocks), chunks))
+        return
+    write_wav_now(dst, sr, channels, frames, pcm_blocks, chunks)
+
+def write_wav_now(dst, sr, channels, frames, pcm_blocks, chunks=()):
+    """
+    Write a 16‑bit PCM WAV from an iterable of PCM byte blocks on the calling thread.
+    """
+    writer = WavWriter(dst, sr, channels, frames, chunks)
     try:
-        encoded_path = os.fsencode(wav_path)
-        with open(encoded_path, 'rb') as f:
-            wav_bytes = f.read()
-        sample_period = int(1e9 / sr)
-        num_loops = len(loop_markers)
-        smpl_header = struct.pack('<9I', 0, 0, sample_period, 60, 0, 0, 0, num_loops, 0)
-        loop_data = b''
-        for i, (start, end) in enumerate(loop_markers):
-            loop_data += struct.pack('<6I', i, 0, start, end, 0, 0)
-        smpl_chunk_data = smpl_header + loop_data
-        smpl_chunk_size = len(smpl_chunk_data)
-        smpl_chunk = b'smpl' + struct.pack('<I', smpl_chunk_size) + smpl_chunk_data
-
-        new_wav_bytes = wav_bytes + smpl_chunk
-        new_riff_size = len(new_wav_bytes) - 8
-        new_wav_bytes = new_wav_bytes[:4] + struct.pack('<I', new_riff_size) + new_wav_bytes[8:]
-        with open(encoded_path, 'wb') as f:
-            f.write(new_wav_bytes)
-    except Exception as e:
-        print(f"Warning: Could not embed loop markers in '{safe_str(wav_path)}': {e}")
+        for block in pcm_blocks:
+            writer.write(block)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
 
 # === Audio Processing Functions ==================================
 def load_audio(file_path):
@@ -244,52 +473,293 @@ def load_audio(file_path):
     y, sr = safe_sf_read(file_path, dtype='float32')
     return y, sr
 
-def apply_pitch_shift(y, sr, semitones):
+def load_sample(file_path, data=None):
     """
-    Pitch shift audio using Rubberband.
+    Read a WAV file once and return (y, sr, loop_markers, chunks).
+    
+    The PCM is decoded from the same bytes the loop markers and preserved metadata chunks
+    are parsed from, instead of opening the file once for each. data, if given, holds the
+    file's bytes already read (e.g. prefetched by the I/O pipeline).
+    """
+    with PROFILER.stage('decode', file_path) as record:
+        if data is None:
+            with open(os.fsencode(file_path), 'rb') as f:
+                data = f.read()
+            record['bytes_read'] += len(data)
+        y, sr = sf.read(io.BytesIO(data), dtype='float32')
+    try:
+        loop_markers = parse_loop_markers(data)
+        chunks = parse_preserved_chunks(data)
+    except Exception as e:
+        print(f"Warning: Could not read loop markers from '{safe_str(file_path)}': {e}")
+        loop_markers, chunks = None, []
+    return y, sr, loop_markers, chunks
+
+def run_rubberband(semitones, input_path, output_path, pass_fds=()):
+    """
+    Run the Rubberband CLI to pitch shift input_path into output_path.
+    """
+    cmd = ['rubberband', '-p', str(semitones), '--fine', input_path, output_path]
+    result = subprocess.run(cmd, capture_output=True, pass_fds=pass_fds)
+    if result.returncode != 0:
+        err = result.stderr.decode('utf-8').strip()
+        raise RuntimeError(f"rubberband pitch shifting failed: {err}")
+
+def pitch_shift_tempfiles(y, sr, semitone_list):
+    """
+    Pitch shift via Rubberband using temporary files on disk (portable fallback).
     
-    Writes the audio to a temporary file, applies pitch shifting via Rubberband, then reads the result.
+    The source is written once and reused for every target in semitone_list.
     """
     with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tf_in:
         input_filename = tf_in.name
     with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tf_out:
         output_filename = tf_out.name
+    shifted = {}
     try:
         sf.write(input_filename, y, sr, subtype='FLOAT')
-        cmd = ['rubberband', '-p', str(semitones), '--fine', input_filename, output_filename]
-        result = subprocess.run(cmd, capture_output=True)
-        if result.returncode != 0:
-            err = result.stderr.decode('utf-8').strip()
-            raise RuntimeError(f"rubberband pitch shifting failed: {err}")
-        y_shifted, sr_out = sf.read(output_filename, dtype='float32')
-        if y_shifted.ndim > 1:
-            y_shifted = y_shifted.mean(axis=1)
+        for semitones in semitone_list:
+            run_rubberband(semitones, input_filename, output_filename)
+            shifted[semitones], sr_out = sf.read(output_filename, dtype='float32')
     finally:
         if os.path.exists(input_filename): os.remove(input_filename)
         if os.path.exists(output_filename): os.remove(output_filename)
-    return y_shifted
+    return shifted
 
-def process_audio(y, sr):
+def pitch_shift_memfd(y, sr, semitone_list):
     """
-    Apply TPDF dithering to reduce quantization error and clip the signal to [-1, 1].
+    Pitch shift via Rubberband using anonymous in-memory files instead of temporary files.
+    
+    The source is encoded once into a memfd and every Rubberband run writes into a second memfd,
+    so the audio never touches the disk. Rubberband needs seekable files named *.wav (plain pipes
+    will not do), so each memfd is reached through a .wav symlink to /dev/fd/N in a private folder;
+    the link resolves in Rubberband's own fd table, where pass_fds keeps the same descriptor numbers.
     """
-    LSB = 1.0 / 32768
-    dither = (np.random.uniform(-LSB/2, LSB/2, size=y.shape) +
-              np.random.uniform(-LSB/2, LSB/2, size=y.shape))
-    y_dithered = y + dither
-    return np.clip(y_dithered, -1.0, 1.0)
+    shifted = {}
+    in_fd = os.memfd_create('rubberband-in')
+    out_fd = os.memfd_create('rubberband-out')
+    try:
+        with open(in_fd, 'wb', closefd=False) as f:
+            sf.write(f, y, sr, subtype='FLOAT', format='WAV')
+        with tempfile.TemporaryDirectory() as link_dir:
+            input_link = os.path.join(link_dir, 'in.wav')
+            output_link = os.path.join(link_dir, 'out.wav')
+            os.symlink(f'/dev/fd/{in_fd}', input_link)
+            os.symlink(f'/dev/fd/{out_fd}', output_link)
+            for semitones in semitone_list:
+                os.ftruncate(out_fd, 0)
+                run_rubberband(semitones, input_link, output_link, pass_fds=(in_fd, out_fd))
+                os.lseek(out_fd, 0, os.SEEK_SET)
+                with open(out_fd, 'rb', closefd=False) as f:
+                    shifted[semitones], sr_out = sf.read(f, dtype='float32')
+    finally:
+        os.close(in_fd)
+        os.close(out_fd)
+    return shifted
+
+# Backends for apply_pitch_shifts; 'auto' prefers in-memory files where the OS supports them.
+PITCH_BACKENDS = {
+    'memfd': pitch_shift_memfd,
+    'tempfile': pitch_shift_tempfiles,
+}
+PITCH_BACKEND = 'auto'
 
-def save_audio(y, sr, dst):
+# === Pitch-Shift Result Cache ====================================
+# Folder of the on-disk cache of shifted audio (None disables it) and its size cap in bytes.
+PITCH_CACHE_DIR = None
+PITCH_CACHE_MAX_BYTES = 10 * 1024**3
+# Bump when the Rubberband options change, so earlier cache entries are no longer used.
+PITCH_CACHE_VERSION = 1
+# Running estimate of the cache size in this process (None until the folder has been scanned).
+pitch_cache_bytes = None
+
+def parse_size(size_str):
+    """
+    Parse a size such as '500M' or '10G' into a number of bytes.
+    """
+    units = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+    size_str = size_str.strip().upper().rstrip('B')
+    if size_str and size_str[-1] in units:
+        return int(float(size_str[:-1]) * units[size_str[-1]])
+    return int(size_str)
+
+def pitch_cache_key(source_digest, sr, semitones):
     """
-    Save the processed audio as a 16‑bit PCM WAV file.
+    Return the cache key of a source (by content digest) shifted by a number of semitones.
     """
-    sf.write(dst, y, sr, subtype='PCM_16')
+    key = f"{PITCH_CACHE_VERSION}:{source_digest}:{sr}:{semitones}"
+    return hashlib.blake2b(key.encode('ascii'), digest_size=20).hexdigest()
 
-def process_and_copy_file(src, dst, skip_existing):
+def pitch_cache_path(key):
+    """
+    Return the file holding the cache entry for key.
+    """
+    return os.path.join(PITCH_CACHE_DIR, key[:2], key + '.npy')
+
+def pitch_cache_load(key):
+    """
+    Return the cached shifted audio for key, or None. A hit refreshes the entry's LRU timestamp.
+    """
+    path = pitch_cache_path(key)
+    try:
+        y_shifted = np.load(path, allow_pickle=False)
+        os.utime(path)
+        return y_shifted
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: Discarding unreadable pitch cache entry '{path}': {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+def pitch_cache_store(key, y_shifted):
+    """
+    Store shifted float32 audio under key (written to a temporary name and renamed into place),
+    then evict the least recently used entries if the cache has grown past its cap.
+    """
+    global pitch_cache_bytes
+    path = pitch_cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.save(f, np.asarray(y_shifted, dtype=np.float32), allow_pickle=False)
+    os.replace(temp_path, path)
+    if pitch_cache_bytes is None:
+        pitch_cache_evict()
+    else:
+        pitch_cache_bytes += os.path.getsize(path)
+        if pitch_cache_bytes > PITCH_CACHE_MAX_BYTES:
+            pitch_cache_evict()
+
+def pitch_cache_evict():
+    """
+    Scan the cache and delete the least recently used entries until it fits under PITCH_CACHE_MAX_BYTES.
+    """
+    global pitch_cache_bytes
+    entries = []
+    for subdir in os.scandir(PITCH_CACHE_DIR):
+        if not subdir.is_dir():
+            continue
+        for entry in os.scandir(subdir.path):
+            if entry.name.endswith('.npy'):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= PITCH_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    pitch_cache_bytes = total
+
+def apply_pitch_shifts(y, sr, semitone_list, source=None):
+    """
+    Pitch shift one source to several semitone offsets using Rubberband.
+    
+    Offsets already in the pitch cache (if enabled) are read from it; the rest are shifted
+    in one batched call and added to the cache. source only labels the profile.
+    Returns a dict mapping each offset to its shifted (monaural) audio.
+    """
+    shifted = {}
+    if PITCH_CACHE_DIR:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{y.dtype.str}{y.shape}".encode('ascii'))
+        digest.update(np.ascontiguousarray(y).data)
+        source_digest = digest.hexdigest()
+        for semitones in semitone_list:
+            with PROFILER.stage('pitch_cache', source) as record:
+                cached = pitch_cache_load(pitch_cache_key(source_digest, sr, semitones))
+                if cached is not None:
+                    record['bytes_read'] += cached.nbytes
+            if cached is not None:
+                shifted[semitones] = cached
+    to_shift = [semitones for semitones in semitone_list if semitones not in shifted]
+    if not to_shift:
+        return shifted
+    backend = PITCH_BACKEND
+    if backend == 'auto':
+        backend = 'memfd' if hasattr(os, 'memfd_create') and os.path.isdir('/dev/fd') else 'tempfile'
+    # Bytes are the float32 audio handed to and received from Rubberband.
+    with PROFILER.stage('pitch_shift', source, bytes_written=y.nbytes) as record:
+        results = PITCH_BACKENDS[backend](y, sr, to_shift)
+        record['bytes_read'] += sum(y_shifted.nbytes for y_shifted in results.values())
+    for semitones, y_shifted in results.items():
+        if y_shifted.ndim > 1:
+            y_shifted = y_shifted.mean(axis=1)
+        shifted[semitones] = y_shifted
+        if PITCH_CACHE_DIR:
+            try:
+                with PROFILER.stage('pitch_cache', source, bytes_written=y_shifted.nbytes):
+                    pitch_cache_store(pitch_cache_key(source_digest, sr, semitones), y_shifted)
+            except OSError as e:
+                print(f"Warning: Could not store pitch cache entry: {e}")
+    return shifted
+
+def apply_pitch_shift(y, sr, semitones):
+    """
+    Pitch shift audio using Rubberband.
+    """
+    return apply_pitch_shifts(y, sr, [semitones])[semitones]
+
+# Seed for the dither noise (None seeds every output from the OS, so every run differs).
+DITHER_SEED = None
+# Output roots (primary and mono): the dither noise of a file is derived from its path under its root.
+OUTPUT_ROOTS = ()
+# Use first-order highpass-shaped TPDF noise instead of flat TPDF noise.
+NOISE_SHAPING = False
+
+def output_rng(dst, variant=0):
+    """
+    Return the random generator for the dither noise of one output file.
+    
+    With DITHER_SEED set, each output gets its own generator derived from the seed and its path under
+    its output root, so the noise does not depend on which worker or in which order the file is
+    produced, and files of the same name in different folders get different noise.
+    """
+    dst_path = os.path.abspath(dst)
+    root = next((root for root in OUTPUT_ROOTS if dst_path.startswith(os.path.join(root, ''))), None)
+    return file_rng(DITHER_SEED, dst_path, variant, root)
+
+def process_audio(y, sr, rng=None, dst=None):
+    """
+    Apply TPDF dithering to reduce quantization error and quantize the signal to clipped 16-bit PCM.
+    
+    Works in float32 blocks of WRITE_BLOCK_FRAMES frames; the streaming path quantizes the same
+    samples with the same generator state, so both give identical output. dst only labels the profile.
+    Returns an int16 array shaped like y.
+    """
+    with PROFILER.stage('dither', dst):
+        return dither_to_pcm16(y, rng, NOISE_SHAPING, WRITE_BLOCK_FRAMES)
+
+def save_audio(y, sr, dst, loop_markers=None, chunks=()):
+    """
+    Save the processed 16‑bit PCM audio as a WAV file, with loop markers and any extra
+    metadata chunks written in the same pass.
+    """
+    chunks = list(chunks)
+    if loop_markers:
+        with PROFILER.stage('smpl_embed', dst) as record:
+            chunks.insert(0, (b'smpl', build_smpl_chunk(loop_markers, sr)))
+            record['bytes_written'] += len(chunks[0][1])
+    channels = 1 if y.ndim == 1 else y.shape[1]
+    with PROFILER.stage('encode', dst, bytes_written=len(y) * channels * 2):
+        write_wav(dst, sr, channels, len(y), iter_pcm16_blocks(y), chunks)
+
+def process_and_copy_file(src, dst, skip_existing, load=load_sample):
     """
     Process a WAV file (load, apply dithering, and re‑embed loop markers) and save it.
     
     If skip_existing is True and the destination file exists and is valid, the processing is skipped.
+    load is called with src to obtain (y, sr, loop_markers, chunks); pass a cached loader to share decodes.
+    
+    Returns the undithered buffer as (y, sr, loop_markers, chunks) so the mono variant can be made
+    from it, or None if processing was skipped.
     """
     if skip_existing and os.path.exists(dst):
         if not is_valid_wav(dst):
@@ -297,30 +767,117 @@ def process_and_copy_file(src, dst, skip_existing):
             os.remove(dst)
         else:
             print(f"Skipping processing of '{safe_str(dst)}' (already exists).")
-            return
-    y, sr = load_audio(src)
-    loop_markers = get_loop_markers(src)
-    y_processed = process_audio(y, sr)
+            return None
+    y, sr, loop_markers, chunks = load(src)
+    y_processed = process_audio(y, sr, output_rng(dst), dst)
+    adjusted = scale_loop_markers(loop_markers, len(y), len(y_processed))
     if skip_existing and os.path.exists(dst):
         if not is_valid_wav(dst):
             print(f"Found invalid/incomplete file '{safe_str(dst)}'; overwriting.")
             os.remove(dst)
-            save_audio(y_processed, sr, dst)
+            save_audio(y_processed, sr, dst, adjusted, chunks)
         else:
             print(f"Skipping generation of '{safe_str(dst)}' (already exists).")
     else:
-        save_audio(y_processed, sr, dst)
-    if loop_markers:
-        orig_length = len(y)
-        new_length = len(y_processed)
-        adjusted = [(int(start * new_length / orig_length), int(end * new_length / orig_length))
-                    for (start, end) in loop_markers]
-        embed_loop_markers(dst, adjusted, sr, orig_length, new_length)
+        save_audio(y_processed, sr, dst, adjusted, chunks)
+    return y, sr, adjusted, chunks
+
+# Files longer than this many seconds are streamed block by block instead of decoded whole.
+STREAM_THRESHOLD_SECONDS = 120
 
-def convert_file_to_mono(src, dst, skip_existing):
+def stream_and_convert_file(src, dst, mono_dst, skip_existing):
     """
-    Convert a WAV file to monaural using SoX and re‑embed loop markers.
+    Dither a long WAV file into both output roots block by block, with memory bounded by one block.
     
+    Each block is read, dithered, clipped and quantized into the stereo output and, with the native
+    mono backend, downmixed and dithered into the mono output in the same pass. The files are identical
+    to those of process_and_copy_file followed by convert_file_to_mono for the same dither seed.
+    """
+    if skip_existing and os.path.exists(dst):
+        if not is_valid_wav(dst):
+            print(f"Found invalid/incomplete file '{safe_str(dst)}'; overwriting.")
+            os.remove(dst)
+        else:
+            print(f"Skipping processing of '{safe_str(dst)}' (already exists).")
+            try:
+                convert_file_to_mono(dst, mono_dst, skip_existing)
+            except Exception as e:
+                print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+            return
+    write_mono = MONO_BACKEND == 'native'
+    if write_mono and skip_existing and os.path.exists(mono_dst):
+        if not is_valid_wav(mono_dst):
+            print(f"Found invalid/incomplete mono file '{safe_str(mono_dst)}'; overwriting.")
+            os.remove(mono_dst)
+        else:
+            print(f"Skipping mono conversion of '{safe_str(mono_dst)}' (already exists).")
+            write_mono = False
+    with PROFILER.stage('decode', src, bytes_read=os.path.getsize(os.fsencode(src))):
+        loop_markers, chunks = read_wav_metadata(src)
+    with open(os.fsencode(src), 'rb') as f, sf.SoundFile(f) as sound:
+        sr, frames = sound.samplerate, sound.frames
+        if loop_markers:
+            with PROFILER.stage('smpl_embed', dst):
+                chunks.insert(0, (b'smpl', build_smpl_chunk(loop_markers, sr)))
+        outputs = [(WavWriter(dst, sr, sound.channels, frames, chunks),
+                    TPDFDither(output_rng(dst), NOISE_SHAPING), None)]
+        try:
+            if write_mono:
+                outputs.append((WavWriter(mono_dst, sr, 1, frames, chunks),
+                                TPDFDither(output_rng(mono_dst, 1), NOISE_SHAPING), downmix_to_mono))
+            for block in PROFILER.iterate('decode', sound.blocks(blocksize=WRITE_BLOCK_FRAMES, dtype='float32'), src):
+                for writer, ditherer, transform in outputs:
+                    if transform:
+                        with PROFILER.stage('mono', writer.dst):
+                            y_block = transform(block)
+                    else:
+                        y_block = block
+                    with PROFILER.stage('dither', writer.dst):
+                        pcm = ditherer.quantize(y_block)
+                    with PROFILER.stage('encode', writer.dst) as record:
+                        for pcm_bytes in iter_pcm16_blocks(pcm):
+                            writer.write(pcm_bytes)
+                            record['bytes_written'] += len(pcm_bytes)
+        except BaseException:
+            for writer, _, _ in outputs:
+                writer.abort()
+            raise
+        for writer, _, _ in outputs:
+            writer.close()
+    if not write_mono:
+        try:
+            convert_file_to_mono(dst, mono_dst, skip_existing)
+        except Exception as e:
+            print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+
+def should_stream(src):
+    """
+    Return True if src is long enough to be processed by the block-streaming path.
+    """
+    if STREAM_THRESHOLD_SECONDS is None:
+        return False
+    info = sf.info(os.fsencode(src))
+    return info.frames > STREAM_THRESHOLD_SECONDS * info.samplerate
+
+def downmix_to_mono(y):
+    """
+    Average all channels of y into one (vectorized); mono input is returned unchanged.
+    """
+    if y.ndim == 1:
+        return y
+    return y.mean(axis=1)
+
+# Backend used by convert_file_to_mono: 'native' downmixes in memory, 'sox' runs SoX on the written file.
+MONO_BACKEND = 'native'
+
+def convert_file_to_mono(src, dst, skip_existing, buffer=None):
+    """
+    Convert a WAV file to monaural and re‑embed loop markers.
+    
+    With the native backend the channels are averaged and TPDF‑dithered in memory. buffer is the
+    (y, sr, loop_markers, chunks) audio the stereo file src was made from; when it is not available
+    src is decoded instead. With the SoX backend, SoX writes raw 16‑bit PCM of src to a pipe, which
+    is written out together with the loop markers in a single pass.
     Skips conversion if the destination file already exists and is valid.
     """
     if skip_existing and os.path.exists(dst):
@@ -330,54 +887,171 @@ def convert_file_to_mono(src, dst, skip_existing):
         else:
             print(f"Skipping mono conversion of '{safe_str(dst)}' (already exists).")
             return
-    cmd = ['sox', src, '-c', '1', dst]
-    result = subprocess.run(cmd, capture_output=True)
+    if MONO_BACKEND == 'native':
+        y, sr, loop_markers, chunks = buffer if buffer is not None else load_sample(src)
+        with PROFILER.stage('mono', dst):
+            y_mono = downmix_to_mono(y)
+        save_audio(process_audio(y_mono, sr, output_rng(dst, 1), dst), sr, dst, loop_markers, chunks)
+        return
+    if WRITE_BEHIND is not None:
+        # src may still be queued for writing.
+        WRITE_BEHIND.wait(src)
+    cmd = ['sox', src, '-t', 'raw', '-e', 'signed-integer', '-b', '16', '-L', '-c', '1', '-']
+    with PROFILER.stage('mono', dst, bytes_read=os.path.getsize(os.fsencode(src))):
+        result = subprocess.run(cmd, capture_output=True)
     if result.returncode != 0:
         err = result.stderr.decode('utf-8').strip()
         raise RuntimeError(f"SoX mono conversion failed for '{safe_str(src)}': {err}")
+    pcm = result.stdout
+    info = sf.info(os.fsencode(src))
+    new_length = len(pcm) // 2
+    chunks = []
     loop_markers = get_loop_markers(src)
     if loop_markers:
-        y_src, sr_src = safe_sf_read(src, dtype='float32')
-        y_dst, sr_dst = safe_sf_read(dst, dtype='float32')
-        orig_length = len(y_src)
-        new_length = len(y_dst)
-        adjusted = [(int(start * new_length / orig_length), int(end * new_length / orig_length))
-                    for (start, end) in loop_markers]
-        embed_loop_markers(dst, adjusted, sr_dst, orig_length, new_length)
+        adjusted = scale_loop_markers(loop_markers, info.frames, new_length)
+        chunks.append((b'smpl', build_smpl_chunk(adjusted, info.samplerate)))
+    with PROFILER.stage('encode', dst, bytes_written=len(pcm)):
+        write_wav(dst, info.samplerate, 1, new_length, [pcm], chunks)
+
+# === Parallel Directory Scan =====================================
+# Number of threads listing directories (and creating output folders) at once. Listing is
+# latency-bound on network shares, so more threads than cores still help there.
+SCAN_THREADS = 8
 
-# === Directory Traversal and Sample‑Set Processing =============
-def process_directory(input_root, output_root, mono_output_root, note_range_midi, skip_existing):
+def scan_directory(dirpath, with_stats=False):
     """
-    Walk through input_root and process sample files.
+    List one directory with os.scandir.
     
-    Filenames in each directory are sanitized and the folder structure is recreated in both output roots.
+    Returns (subdirs, dirnames, filenames, file_stats). subdirs are the directories to descend into:
+    symlinks to directories are listed in dirnames but not followed, as with os.walk. With with_stats,
+    file_stats maps each file name to its DirEntry stat (cached by the listing on Windows and SMB).
+    An unreadable directory is listed as empty, as os.walk skips it.
+    """
+    subdirs, dirnames, filenames, file_stats = [], [], [], {}
+    try:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirnames.append(entry.name)
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+                filenames.append(entry.name)
+                if with_stats:
+                    try:
+                        file_stats[entry.name] = entry.stat()
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+    return subdirs, dirnames, filenames, file_stats
+
+def scan_tree(root, threads=SCAN_THREADS, with_stats=False):
+    """
+    Walk root top-down like os.walk, listing directories on a pool of threads.
+    
+    Every subdirectory is queued for listing as soon as its parent has been listed, so the whole
+    tree is read ahead of the caller, while the directories are yielded in the order os.walk would
+    give them, as (dirpath, dirnames, filenames, file_stats) (see scan_directory).
+    """
+    listings = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        def list_directory(dirpath):
+            listing = scan_directory(dirpath, with_stats)
+            for subdir in listing[0]:
+                listings[subdir] = executor.submit(list_directory, subdir)
+            return listing
+
+        listings[root] = executor.submit(list_directory, root)
+        stack = [root]
+        while stack:
+            dirpath = stack.pop()
+            subdirs, dirnames, filenames, file_stats = listings.pop(dirpath).result()
+            stack.extend(reversed(subdirs))
+            yield dirpath, dirnames, filenames, file_stats
+
+def make_directories(paths, threads=SCAN_THREADS):
+    """
+    Create every folder in paths in one pass, parents before children.
+    
+    Each folder costs a single mkdir (an existing one just fails with EEXIST), and the folders of
+    one depth are created in parallel.
+    """
+    levels = {}
+    for path in {os.path.normpath(path) for path in paths}:
+        levels.setdefault(path.count(os.sep), []).append(path)
+
+    def make_directory(path):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            pass
+        except FileNotFoundError:
+            # A parent outside the batch (e.g. above an output root) is missing.
+            os.makedirs(path, exist_ok=True)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        for depth in sorted(levels):
+            list(executor.map(make_directory, sorted(levels[depth])))
+
+# === Directory Traversal and Job Planning ======================
+def plan_jobs(input_root, output_root, mono_output_root, note_range_midi, dry_run=False,
+              scan_threads=SCAN_THREADS, source_stats=None):
+    """
+    Walk through input_root and build the list of independent jobs to run.
+    
+    Directories are listed on scan_threads threads. Filenames in each directory are sanitized while
+    planning, and the folder structure is then recreated in both output roots in one batch, so that
+    the jobs themselves only read sources and write their own destinations.
+    With dry_run, names are only sanitized virtually and nothing is created; jobs then read the files
+    under their current names and write them under their sanitized ones.
+    If source_stats is a dict, it receives the stat of every source file seen by the scan, by path.
+    
+    Each job is a tuple whose first element names its kind:
+      ('copy', src, dst, mono_dst)            copy a non‑wav file to both output roots
+      ('dither', src, dst, mono_dst)          dither a wav file and convert the result to mono
+      ('sample_set', base, candidates, copies, missing, out_dir, mono_dir)
+                                              dither every note of a sample set, then pitch‑shift the
+                                              nearest candidate into each missing note
     
     When a note range is provided (pitched mode), files are grouped based on their base name and the pitch
-    immediately before the ".wav" extension. For each group, missing notes within the specified range are filled
-    in by pitch-shifting the nearest candidate.
+    immediately before the ".wav" extension, and every group becomes one 'sample_set' job so that each
+    source is decoded only once for both its own copy and the notes generated from it.
     
     If no note range is provided, all .wav files are simply processed as-is.
     """
-    for dirpath, dirnames, filenames in os.walk(input_root):
-        filenames = sanitize_directory(dirpath, filenames)
+    jobs = []
+    output_dirs = []
+    for dirpath, dirnames, scanned_names, file_stats in scan_tree(input_root, scan_threads,
+                                                                  source_stats is not None):
+        if dry_run:
+            filenames, source_names = plan_sanitized_names(dirpath, scanned_names, dirnames)
+        else:
+            filenames, source_names = sanitize_directory(dirpath, scanned_names, dirnames), {}
         
         rel_dir = os.path.relpath(dirpath, input_root)
         out_dir = os.path.join(output_root, rel_dir)
         mono_dir = os.path.join(mono_output_root, rel_dir)
-        os.makedirs(out_dir, exist_ok=True)
-        os.makedirs(mono_dir, exist_ok=True)
+        output_dirs += [out_dir, mono_dir]
+
+        def source_path(fname):
+            return os.path.join(dirpath, source_names.get(fname, fname))
+
+        if source_stats is not None:
+            for scanned_name, fname in zip(scanned_names, filenames):
+                if scanned_name in file_stats:
+                    source_stats[source_path(fname)] = file_stats[scanned_name]
 
         # Copy non‑wav files unchanged.
         for fname in filenames:
             if fname.startswith('.') or fname.lower().endswith('.wav'):
                 continue
-            src_file = os.path.join(dirpath, fname)
-            dst_file = os.path.join(out_dir, fname)
-            mono_dst = os.path.join(mono_dir, fname)
-            if not (skip_existing and os.path.exists(dst_file)):
-                shutil.copy2(src_file, dst_file)
-            if not (skip_existing and os.path.exists(mono_dst)):
-                shutil.copy2(src_file, mono_dst)
+            jobs.append(('copy', source_path(fname),
+                         os.path.join(out_dir, fname), os.path.join(mono_dir, fname)))
 
         if note_range_midi is None:
             # Non‑pitched mode: simply process all .wav files.
@@ -389,14 +1063,8 @@ def process_directory(input_root, output_root, mono_output_root, note_range_midi
                 if new_fname is None:
                     print(f"Skipping {fname} because MIDI offset note is out-of-range.")
                     continue
-                src = os.path.join(dirpath, fname)
-                dst = os.path.join(out_dir, new_fname)
-                process_and_copy_file(src, dst, skip_existing)
-                mono_dst = os.path.join(mono_dir, new_fname)
-                try:
-                    convert_file_to_mono(dst, mono_dst, skip_existing)
-                except Exception as e:
-                    print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+                jobs.append(('dither', source_path(fname),
+                             os.path.join(out_dir, new_fname), os.path.join(mono_dir, new_fname)))
         else:
             # Pitched mode: group files by base name using only the pitch immediately before the extension.
             pattern = re.compile(r'^(.*)_([A-G][#]?\d)\.wav$', re.IGNORECASE)
@@ -414,8 +1082,7 @@ def process_directory(input_root, output_root, mono_output_root, note_range_midi
                     except Exception as e:
                         print(f"Warning: Could not parse note in filename '{safe_str(fname)}': {e}")
                         continue
-                    full_path = os.path.join(dirpath, fname)
-                    sample_sets.setdefault(base_name, []).append((midi, full_path))
+                    sample_sets.setdefault(base_name, []).append((midi, source_path(fname)))
                 else:
                     non_matching_wavs.append(fname)
             
@@ -425,81 +1092,1066 @@ def process_directory(input_root, output_root, mono_output_root, note_range_midi
                 if new_fname is None:
                     print(f"Skipping {fname} because MIDI offset note is out-of-range.")
                     continue
-                src = os.path.join(dirpath, fname)
-                dst = os.path.join(out_dir, new_fname)
-                process_and_copy_file(src, dst, skip_existing)
-                mono_dst = os.path.join(mono_dir, new_fname)
-                try:
-                    convert_file_to_mono(dst, mono_dst, skip_existing)
-                except Exception as e:
-                    print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+                jobs.append(('dither', source_path(fname),
+                             os.path.join(out_dir, new_fname), os.path.join(mono_dir, new_fname)))
             
             # Process each sample set.
             for base, candidates in sample_sets.items():
                 # Process each original candidate file.
+                copies = []
                 for midi, src in candidates:
                     new_fname = f"{base}_{midi_to_note_name(midi)}.wav"
                     new_fname = modify_filename(new_fname, note_range_midi)
                     if new_fname is None:
                         print(f"Skipping candidate {src} because generated MIDI offset note is out-of-range.")
                         continue
-                    dst = os.path.join(out_dir, new_fname)
-                    process_and_copy_file(src, dst, skip_existing)
-                    mono_dst = os.path.join(mono_dir, new_fname)
-                    try:
-                        convert_file_to_mono(dst, mono_dst, skip_existing)
-                    except Exception as e:
-                        print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+                    copies.append((src, new_fname))
                 provided_notes = {midi for midi, _ in candidates}
-                missing_midis = [m for m in note_range_midi if m not in provided_notes]
-                for target_midi in missing_midis:
-                    # Choose the candidate that minimizes the absolute pitch difference.
-                    candidate = min(candidates, key=lambda c: abs(c[0] - target_midi))
-                    source_midi, src = candidate
-                    semitones = target_midi - source_midi
+                missing = []
+                for target_midi in note_range_midi:
+                    if target_midi in provided_notes:
+                        continue
                     new_fname = f"{base}_{midi_to_note_name(target_midi)}.wav"
                     new_fname = modify_filename(new_fname, note_range_midi)
                     if new_fname is None:
-                        print(f"Skipping missing note generation for {src} because generated MIDI offset note is out-of-range.")
-                        continue
-                    try:
-                        y, sr = load_audio(src)
-                    except Exception as e:
-                        print(f"Error loading '{safe_str(src)}': {e}")
-                        continue
-                    try:
-                        y_shifted = apply_pitch_shift(y, sr, semitones) if semitones != 0 else y
-                    except Exception as e:
-                        print(f"Error pitch shifting '{safe_str(src)}': {e}")
+                        print(f"Skipping missing note generation for {base} because generated MIDI offset note is out-of-range.")
                         continue
-                    y_processed = process_audio(y_shifted, sr)
-                    dst = os.path.join(out_dir, new_fname)
-                    if skip_existing and os.path.exists(dst):
-                        if not is_valid_wav(dst):
-                            print(f"Found invalid/incomplete file '{safe_str(dst)}'; overwriting.")
-                            os.remove(dst)
-                        else:
-                            print(f"Skipping generation of '{safe_str(dst)}' (already exists).")
-                            continue
-                    save_audio(y_processed, sr, dst)
-                    loop_markers = get_loop_markers(src)
-                    if loop_markers:
-                        orig_length = len(y)
-                        new_length = len(y_processed)
-                        adjusted = [(int(start * new_length / orig_length), int(end * new_length / orig_length))
-                                    for (start, end) in loop_markers]
-                        embed_loop_markers(dst, adjusted, sr, orig_length, new_length)
-                    print(f"Generated missing sample: {safe_str(dst)}")
-                    mono_dst = os.path.join(mono_dir, new_fname)
+                    missing.append((target_midi, new_fname))
+                if copies or missing:
+                    jobs.append(('sample_set', base, candidates, copies, missing, out_dir, mono_dir))
+    if not dry_run:
+        make_directories(output_dirs, scan_threads)
+    return jobs
+
+# === Job Execution ===============================================
+# How non‑wav files are copied: 'copy', 'hardlink', 'reflink' or 'auto' (see link_copy.py).
+LINK_MODE = 'copy'
+
+def copy_non_wav_file(src, dst, mono_dst, skip_existing):
+    """
+    Copy a non‑wav file unchanged into both output roots, linking or cloning it as LINK_MODE allows.
+    """
+    for path in (dst, mono_dst):
+        if not (skip_existing and os.path.exists(path)):
+            with PROFILER.stage('copy', path) as record:
+                temp_path = partial_path(path)
+                try:
+                    method = link_or_copy(src, temp_path, LINK_MODE)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    if os.path.lexists(temp_path):
+                        os.remove(temp_path)
+                    raise
+                if method in ('copy', 'copy_file_range'):
+                    size = os.path.getsize(os.fsencode(src))
+                    record['bytes_read'] += size
+                    record['bytes_written'] += size
+
+def dither_and_convert_file(src, dst, mono_dst, skip_existing, load=load_sample):
+    """
+    Dither a WAV file into the primary output root, then write its mono variant from the same buffer.
+    
+    Long files are streamed block by block instead, whatever the loader (they never go through load,
+    so a sample set's cache or the pipeline's prefetched bytes do not hold them).
+    """
+    if should_stream(src):
+        stream_and_convert_file(src, dst, mono_dst, skip_existing)
+        return
+    buffer = process_and_copy_file(src, dst, skip_existing, load)
+    try:
+        convert_file_to_mono(dst, mono_dst, skip_existing, buffer)
+    except Exception as e:
+        print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+
+def group_missing_notes(candidates, missing):
+    """
+    Return the missing notes of a sample set grouped by the candidate they are pitch-shifted from,
+    as {(source_midi, src): [(target_midi, new_fname), ...]}, so each source is shifted in one batched call.
+    """
+    by_source = {}
+    for target_midi, new_fname in missing:
+        # Choose the candidate that minimizes the absolute pitch difference.
+        candidate = min(candidates, key=lambda c: abs(c[0] - target_midi))
+        by_source.setdefault(candidate, []).append((target_midi, new_fname))
+    return by_source
+
+def process_sample_set(base, candidates, copies, missing, out_dir, mono_dir, skip_existing, load=load_sample):
+    """
+    Dither every provided note of a sample set and generate each missing note by pitch-shifting
+    the nearest candidate.
+    
+    copies is a list of (src, new_fname) pairs and missing a list of (target_midi, new_fname) pairs,
+    both resolved while planning. The notes generated from a candidate are made right after its copy,
+    from the same decode (PCM and loop markers together), which is then released: at most one decode
+    is held at a time, and only for a candidate some missing note is generated from.
+    """
+    sources = {src: (source_midi, targets)
+               for (source_midi, src), targets in group_missing_notes(candidates, missing).items()}
+    decodes = {}
+
+    def load_source(path):
+        # Keep the decode of a candidate for the notes generated from it.
+        if path not in decodes:
+            decoded = load(path)
+            if path not in sources:
+                return decoded
+            decodes[path] = decoded
+        return decodes[path]
+
+    for src, new_fname in copies:
+        dither_and_convert_file(src, os.path.join(out_dir, new_fname), os.path.join(mono_dir, new_fname),
+                                skip_existing, load_source)
+        if src in sources:
+            source_midi, targets = sources.pop(src)
+            fill_missing_notes(source_midi, src, targets, out_dir, mono_dir, skip_existing, load_source)
+        decodes.pop(src, None)
+    # Candidates not copied by this set, if any.
+    for src, (source_midi, targets) in sources.items():
+        fill_missing_notes(source_midi, src, targets, out_dir, mono_dir, skip_existing, load)
+
+def fill_missing_notes(source_midi, src, targets, out_dir, mono_dir, skip_existing, load=load_sample):
+    """
+    Generate the missing notes of a sample set nearest to the candidate src (at source_midi) by
+    pitch-shifting it, in one batched call.
+    
+    targets is a list of (target_midi, new_fname) pairs resolved while planning.
+    """
+    pending = []
+    for target_midi, new_fname in targets:
+        dst = os.path.join(out_dir, new_fname)
+        if skip_existing and os.path.exists(dst):
+            if not is_valid_wav(dst):
+                print(f"Found invalid/incomplete file '{safe_str(dst)}'; overwriting.")
+                os.remove(dst)
+            else:
+                print(f"Skipping generation of '{safe_str(dst)}' (already exists).")
+                continue
+        pending.append((target_midi, new_fname))
+    if not pending:
+        return
+    try:
+        y, sr, loop_markers, _ = load(src)
+    except Exception as e:
+        print(f"Error loading '{safe_str(src)}': {e}")
+        return
+    try:
+        shifted = apply_pitch_shifts(y, sr, [target_midi - source_midi for target_midi, _ in pending], src)
+    except Exception as e:
+        print(f"Error pitch shifting '{safe_str(src)}': {e}")
+        return
+    for target_midi, new_fname in pending:
+        y_shifted = shifted[target_midi - source_midi]
+        dst = os.path.join(out_dir, new_fname)
+        y_processed = process_audio(y_shifted, sr, output_rng(dst), dst)
+        adjusted = scale_loop_markers(loop_markers, len(y), len(y_processed))
+        save_audio(y_processed, sr, dst, adjusted)
+        print(f"Generated missing sample: {safe_str(dst)}")
+        mono_dst = os.path.join(mono_dir, new_fname)
+        try:
+            convert_file_to_mono(dst, mono_dst, skip_existing, (y_shifted, sr, adjusted, []))
+        except Exception as e:
+            print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+
+JOB_RUNNERS = {
+    'copy': copy_non_wav_file,
+    'dither': dither_and_convert_file,
+    'sample_set': process_sample_set,
+}
+
+def describe_job(job):
+    """
+    Return a short human‑readable description of a job for error messages.
+    """
+    kind = job[0]
+    if kind == 'sample_set':
+        return f"sample set '{safe_str(job[1])}' in '{safe_str(job[5])}'"
+    return f"{kind} of '{safe_str(job[1])}'"
+
+def run_job(job, skip_existing, **options):
+    """
+    Run a single job, reporting (rather than raising) any error so that other jobs keep going.
+    
+    options are passed on to the job's runner (e.g. load for the file loader).
+    Returns True if the job completed without an unhandled error.
+    """
+    try:
+        JOB_RUNNERS[job[0]](*job[1:], skip_existing, **options)
+        return True
+    except Exception as e:
+        print(f"Error in {describe_job(job)}: {e}")
+        return False
+
+def current_settings():
+    """
+    Return the module-level settings that worker processes must share with the parent.
+    """
+    return {'pitch_backend': PITCH_BACKEND, 'mono_backend': MONO_BACKEND,
+            'pitch_cache_dir': PITCH_CACHE_DIR, 'pitch_cache_max_bytes': PITCH_CACHE_MAX_BYTES,
+            'dither_seed': DITHER_SEED, 'output_roots': OUTPUT_ROOTS, 'noise_shaping': NOISE_SHAPING,
+            'stream_threshold_seconds': STREAM_THRESHOLD_SECONDS, 'link_mode': LINK_MODE,
+            'profile': PROFILER.enabled}
+
+def configure_worker(settings):
+    """
+    Apply module-level settings chosen on the command line (also used as the process-pool initializer).
+    """
+    global PITCH_BACKEND, MONO_BACKEND, PITCH_CACHE_DIR, PITCH_CACHE_MAX_BYTES
+    global DITHER_SEED, OUTPUT_ROOTS, NOISE_SHAPING, STREAM_THRESHOLD_SECONDS, LINK_MODE
+    PITCH_BACKEND = settings['pitch_backend']
+    MONO_BACKEND = settings['mono_backend']
+    PITCH_CACHE_DIR = settings['pitch_cache_dir']
+    PITCH_CACHE_MAX_BYTES = settings['pitch_cache_max_bytes']
+    DITHER_SEED = settings['dither_seed']
+    OUTPUT_ROOTS = settings['output_roots']
+    NOISE_SHAPING = settings['noise_shaping']
+    STREAM_THRESHOLD_SECONDS = settings['stream_threshold_seconds']
+    LINK_MODE = settings['link_mode']
+    PROFILER.enabled = settings['profile']
+    # A forked worker inherits the parent's records; drop them so they are not merged back twice.
+    PROFILER.take()
+
+def run_job_captured(job, skip_existing):
+    """
+    Run a job in a worker process, capturing everything it prints.
+    
+    Returns (log_text, ok, profile_records) so the parent can print each job's log as one uninterrupted
+    block and merge the job's stage timings into its own profile.
+    """
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        ok = run_job(job, skip_existing)
+    return buffer.getvalue(), ok, PROFILER.take()
+
+def run_jobs(jobs, skip_existing, num_jobs=1, on_result=None, pipeline_workers=0, on_start=None):
+    """
+    Run the planned jobs, either serially, on a pool of num_jobs worker processes, or in this
+    process through the I/O pipeline with pipeline_workers compute threads.
+    
+    In pool and pipeline mode the log of each job is printed in planning order, so the output reads
+    the same as a serial run. on_start and on_result, if given, are called in this process with job
+    when the job is handed to a worker and with (job, ok) after it finished.
+    Returns the number of failed jobs.
+    """
+    failed = 0
+    if pipeline_workers > 0:
+        return run_jobs_pipelined(jobs, skip_existing, pipeline_workers, on_result=on_result, on_start=on_start)
+    if num_jobs <= 1:
+        for job in jobs:
+            if on_start:
+                on_start(job)
+            ok = run_job(job, skip_existing)
+            if not ok:
+                failed += 1
+            if on_result:
+                on_result(job, ok)
+        return failed
+    worker = functools.partial(run_job_captured, skip_existing=skip_existing)
+    if on_start:
+        # The pool is handed every job at once.
+        for job in jobs:
+            on_start(job)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_jobs, initializer=configure_worker,
+                                                initargs=(current_settings(),)) as executor:
+        for job, (log_text, ok, profile_records) in zip(jobs, executor.map(worker, jobs)):
+            print(log_text, end='', flush=True)
+            PROFILER.merge(profile_records)
+            if not ok:
+                failed += 1
+            if on_result:
+                on_result(job, ok)
+    return failed
+
+# === Overlapped I/O Pipeline =====================================
+# Number of jobs read ahead, and of finished files waiting for the writer thread.
+PIPELINE_DEPTH = 4
+# Bytes of prefetched sources held at once, from their read until their job is done.
+PIPELINE_MAX_BYTES = 256 * 1024 * 1024
+
+class ThreadOutput(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that sends each thread's output to that thread's own buffer, if it has one.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self):
+        """
+        Start capturing this thread's output into a new buffer and return it.
+        """
+        self.local.buffer = io.StringIO()
+        return self.local.buffer
+
+    def release(self):
+        """
+        Stop capturing this thread's output and return what was captured.
+        """
+        buffer, self.local.buffer = self.local.buffer, None
+        return buffer.getvalue()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+class PendingWrite:
+    """
+    A file handed to the writer thread: done is set once it is written, error holds any failure.
+    """
+    def __init__(self, dst, write):
+        self.dst = dst
+        self.write = write
+        self.done = threading.Event()
+        self.error = None
+
+class WriteBehind:
+    """
+    Writer thread taking finished files from a bounded queue and writing them in the order submitted.
+    
+    The bounded queue caps the memory held by finished files; compute threads block on submit()
+    while it is full. Each thread collects the writes it submitted, so a job can be checked for
+    write errors once its files are on disk.
+    """
+    def __init__(self, depth=PIPELINE_DEPTH):
+        self.queue = queue.Queue(maxsize=depth)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.thread = threading.Thread(target=self.run, name='wav-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, dst, write):
+        """
+        Queue write() (which writes dst) for the writer thread.
+        """
+        pending = PendingWrite(dst, write)
+        with self.lock:
+            self.pending[dst] = pending
+        self.local.__dict__.setdefault('submitted', []).append(pending)
+        self.queue.put(pending)
+
+    def take_submitted(self):
+        """
+        Return the writes submitted by this thread since the last call.
+        """
+        submitted = self.local.__dict__.get('submitted', [])
+        self.local.submitted = []
+        return submitted
+
+    def wait(self, dst):
+        """
+        Block until dst, if it was submitted, has been written.
+        """
+        with self.lock:
+            pending = self.pending.get(dst)
+        if pending is not None:
+            pending.done.wait()
+
+    def run(self):
+        while True:
+            pending = self.queue.get()
+            if pending is None:
+                return
+            try:
+                with PROFILER.stage('write', pending.dst):
+                    pending.write()
+            except Exception as e:
+                pending.error = e
+            finally:
+                with self.lock:
+                    self.pending.pop(pending.dst, None)
+                pending.done.set()
+
+    def close(self):
+        """
+        Write everything still queued and stop the writer thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+def prefetch_paths(job):
+    """
+    Return the sources a job will decode, which the pipeline reads ahead into memory.
+    
+    Files long enough to be streamed are left on disk: streamed copies never load them, and a long
+    candidate is decoded straight from disk when notes are generated from it.
+    """
+    if job[0] == 'dither':
+        paths = [job[1]]
+    elif job[0] == 'sample_set':
+        base, candidates, copies, missing, out_dir, mono_dir = job[1:]
+        paths = [src for src, _ in copies]
+        paths += [src for _, src in group_missing_notes(candidates, missing)]
+    else:
+        paths = []
+    return [path for path in dict.fromkeys(paths) if not should_stream(path)]
+
+def read_sources(paths):
+    """
+    Read files into memory and return them as {path: bytes}.
+    """
+    prefetched = {}
+    for path in paths:
+        with PROFILER.stage('prefetch', path) as record:
+            with open(os.fsencode(path), 'rb') as f:
+                prefetched[path] = f.read()
+            record['bytes_read'] += len(prefetched[path])
+    return prefetched
+
+class ByteBudget:
+    """
+    Count of the bytes held by the pipeline, capped at max_bytes.
+    
+    acquire waits while taking more would go over the cap, unless nothing is held, so a job larger
+    than the cap still runs, alone.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size, stop):
+        """
+        Take size bytes once they fit; returns False if stop is set first.
+        """
+        with self.condition:
+            while self.used and self.used + size > self.max_bytes:
+                if stop.is_set():
+                    return False
+                self.condition.wait(timeout=0.1)
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+def load_prefetched(prefetched, file_path):
+    """
+    Load a sample from its prefetched bytes, or from disk if it was not prefetched.
+    """
+    return load_sample(file_path, prefetched.pop(file_path, None))
+
+def run_job_pipelined(job, prefetched, skip_existing, output):
+    """
+    Run a job on a compute thread of the pipeline, decoding its sources from the prefetched bytes.
+    
+    Returns (log_text, ok, writes) where writes are the files the job handed to the writer thread.
+    """
+    output.capture()
+    try:
+        options = {'load': functools.partial(load_prefetched, prefetched)} if prefetched else {}
+        ok = run_job(job, skip_existing, **options)
+    finally:
+        log_text = output.release()
+    return log_text, ok, WRITE_BEHIND.take_submitted()
+
+def run_jobs_pipelined(jobs, skip_existing, workers, depth=PIPELINE_DEPTH, on_result=None, on_start=None,
+                       max_bytes=PIPELINE_MAX_BYTES):
+    """
+    Run the jobs in this process with reads, compute and writes overlapped.
+    
+    A reader thread prefetches the sources of the next jobs into a bounded queue, workers compute
+    threads decode, pitch shift and dither them, and a writer thread writes the finished files from
+    a second bounded queue. The bounded queues cap the memory in flight while hiding disk and network
+    latency: at most depth jobs are read ahead, and the sources they read into memory are counted
+    against max_bytes until their job is done (files long enough to be streamed are not read ahead). Logs are printed and on_result is called in planning order, once each job's files are written.
+    Returns the number of failed jobs.
+    """
+    global WRITE_BEHIND
+    read_queue = queue.Queue(maxsize=depth)
+    budget = ByteBudget(max_bytes)
+    stop = threading.Event()
+
+    def reader():
+        for job in jobs:
+            try:
+                paths = prefetch_paths(job)
+                size = sum(os.path.getsize(os.fsencode(path)) for path in paths)
+            except Exception:
+                paths, size = [], 0
+            if not budget.acquire(size, stop):
+                return
+            try:
+                item = (job, read_sources(paths), size)
+            except Exception:
+                # Let the job itself report the unreadable source.
+                item = (job, {}, size)
+            while not stop.is_set():
+                try:
+                    read_queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set():
+                return
+        read_queue.put(None)
+
+    failed = 0
+    output = ThreadOutput(sys.stdout)
+    WRITE_BEHIND = WriteBehind(depth)
+    reader_thread = threading.Thread(target=reader, name='sample-reader', daemon=True)
+    in_flight = collections.deque()
+
+    def finish():
+        nonlocal failed
+        job, future, size = in_flight.popleft()
+        log_text, ok, writes = future.result()
+        budget.release(size)
+        for pending in writes:
+            pending.done.wait()
+            if pending.error is not None:
+                log_text += f"Error writing '{safe_str(pending.dst)}': {pending.error}\n"
+                ok = False
+        print(log_text, end='', flush=True)
+        if not ok:
+            failed += 1
+        if on_result:
+            on_result(job, ok)
+
+    try:
+        with contextlib.redirect_stdout(output), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            reader_thread.start()
+            while True:
+                item = read_queue.get()
+                if item is None:
+                    break
+                job, prefetched, size = item
+                if on_start:
+                    on_start(job)
+                in_flight.append((job, executor.submit(run_job_pipelined, job, prefetched, skip_existing, output),
+                                  size))
+                while len(in_flight) > workers:
+                    finish()
+            while in_flight:
+                finish()
+    finally:
+        stop.set()
+        WRITE_BEHIND.close()
+        WRITE_BEHIND = None
+    return failed
+
+# === Dry-Run Planner and Cost Estimates ==========================
+# Rough per-core costs used by --plan, in CPU seconds per million samples processed.
+CPU_SECONDS_PER_MSAMPLE = {
+    'decode': 0.01,
+    'dither': 0.05,
+    'encode': 0.02,
+    'pitch_shift': 1.5,
+}
+# Shifts further than this many semitones are flagged in the plan.
+LARGE_SHIFT_SEMITONES = 12
+
+def read_wav_format(file_path):
+    """
+    Return (channels, sample_rate, frames) from a WAV file's header, without reading its audio.
+    """
+    with open(os.fsencode(file_path), 'rb') as f:
+        header = f.read(12)
+        if header[0:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError("not a RIFF/WAVE file")
+        channels = sr = block_align = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError("no data chunk")
+            chunk_size = struct.unpack('<I', chunk_header[4:8])[0]
+            if chunk_header[0:4] == b'fmt ':
+                fmt_chunk = f.read(chunk_size + (chunk_size & 1))
+                channels, sr, _, block_align = struct.unpack('<HIIH', fmt_chunk[2:14])
+            elif chunk_header[0:4] == b'data':
+                if not block_align:
+                    raise ValueError("data chunk before fmt chunk")
+                return channels, sr, chunk_size // block_align
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+def estimate_job(job):
+    """
+    Estimate the bytes read and written and the CPU seconds of a job from its sources' sizes and headers.
+    
+    Returns a dict describing the job for the plan, including every pitch shift with its semitone distance.
+    """
+    kind = job[0]
+    estimate = {'kind': kind, 'bytes_read': 0, 'bytes_written': 0, 'cpu_seconds': 0.0, 'outputs': job_outputs(job)}
+    if kind == 'copy':
+        size = os.path.getsize(os.fsencode(job[1]))
+        estimate.update(source=job[1], bytes_read=2 * size, bytes_written=2 * size)
+        return estimate
+    if kind == 'dither':
+        sources = [(job[1], 1)]
+        shifts = []
+    else:
+        base, candidates, copies, missing, out_dir, mono_dir = job[1:]
+        estimate['sample_set'] = base
+        sources = [(src, 1) for src, _ in copies]
+        shifts = []
+        for target_midi, new_fname in missing:
+            source_midi, src = min(candidates, key=lambda c: abs(c[0] - target_midi))
+            shifts.append({'target': midi_to_note_name(target_midi), 'source': src,
+                           'semitones': target_midi - source_midi, 'output': new_fname})
+        estimate['shifts'] = shifts
+    formats = {}
+    for src in {src for src, _ in sources} | {shift['source'] for shift in shifts}:
+        estimate['bytes_read'] += os.path.getsize(os.fsencode(src))
+        formats[src] = read_wav_format(src)
+    cpu = 0.0
+    for src, _ in sources:
+        channels, sr, frames = formats[src]
+        # A dithered copy in the primary root and a mono copy beside it.
+        estimate['bytes_written'] += frames * channels * 2 + frames * 2
+        cpu += frames * (channels + 1) * (CPU_SECONDS_PER_MSAMPLE['dither'] + CPU_SECONDS_PER_MSAMPLE['encode'])
+        cpu += frames * channels * CPU_SECONDS_PER_MSAMPLE['decode']
+    for shift in shifts:
+        channels, sr, frames = formats[shift['source']]
+        # Shifted notes are monaural in both output roots.
+        estimate['bytes_written'] += 2 * frames * 2
+        cpu += frames * channels * CPU_SECONDS_PER_MSAMPLE['pitch_shift']
+        cpu += 2 * frames * (CPU_SECONDS_PER_MSAMPLE['dither'] + CPU_SECONDS_PER_MSAMPLE['encode'])
+    estimate['cpu_seconds'] = cpu / 1e6
+    if kind == 'dither':
+        estimate['source'] = job[1]
+    return estimate
+
+def format_bytes(num_bytes):
+    """
+    Format a byte count for humans (e.g. '1.5 GB').
+    """
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(num_bytes) < 1024 or unit == 'TB':
+            return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{num_bytes} B"
+        num_bytes /= 1024
+
+def print_plan(jobs, plan_format='text'):
+    """
+    Print the job graph of a run with estimated I/O and CPU cost, as text or JSON.
+    """
+    estimates = []
+    for job in jobs:
+        try:
+            estimates.append(estimate_job(job))
+        except (OSError, ValueError, struct.error) as e:
+            estimates.append({'kind': job[0], 'error': str(e), 'outputs': job_outputs(job),
+                              'bytes_read': 0, 'bytes_written': 0, 'cpu_seconds': 0.0})
+    shifts = [shift for estimate in estimates for shift in estimate.get('shifts', [])]
+    totals = {
+        'jobs': len(estimates),
+        'copies': sum(1 for e in estimates if e['kind'] == 'copy'),
+        'dithers': sum(1 for e in estimates if e['kind'] == 'dither') +
+                   sum(len(job[3]) for job in jobs if job[0] == 'sample_set'),
+        'mono_conversions': sum(1 for e in estimates if e['kind'] == 'dither') +
+                            sum(len(job[3]) + len(job[4]) for job in jobs if job[0] == 'sample_set'),
+        'pitch_shifts': len(shifts),
+        'large_shifts': sum(1 for shift in shifts if abs(shift['semitones']) > LARGE_SHIFT_SEMITONES),
+        'bytes_read': sum(e['bytes_read'] for e in estimates),
+        'bytes_written': sum(e['bytes_written'] for e in estimates),
+        'cpu_seconds': sum(e['cpu_seconds'] for e in estimates),
+        'errors': sum(1 for e in estimates if 'error' in e),
+    }
+    if plan_format == 'json':
+        print(json.dumps({'jobs': estimates, 'totals': totals}, indent=2))
+        return
+    for estimate in estimates:
+        label = estimate.get('source') or estimate.get('sample_set') or ''
+        if 'error' in estimate:
+            print(f"{estimate['kind']:<10} {safe_str(label)}  (could not estimate: {estimate['error']})")
+            continue
+        print(f"{estimate['kind']:<10} {safe_str(label)}  read {format_bytes(estimate['bytes_read'])}, "
+              f"write {format_bytes(estimate['bytes_written'])}, ~{estimate['cpu_seconds']:.1f} CPU s")
+        for shift in estimate.get('shifts', []):
+            flag = '  <-- large shift' if abs(shift['semitones']) > LARGE_SHIFT_SEMITONES else ''
+            print(f"           {shift['target']:>4} <- {safe_str(os.path.basename(shift['source']))} "
+                  f"({shift['semitones']:+d} st){flag}")
+    print()
+    print(f"Jobs: {totals['jobs']} ({totals['copies']} copies, {totals['dithers']} dithers, "
+          f"{totals['mono_conversions']} mono conversions, {totals['pitch_shifts']} pitch shifts, "
+          f"{totals['large_shifts']} beyond ±{LARGE_SHIFT_SEMITONES} semitones)")
+    print(f"Estimated I/O: read {format_bytes(totals['bytes_read'])}, write {format_bytes(totals['bytes_written'])}")
+    print(f"Estimated CPU: {totals['cpu_seconds']:.0f} s on one core")
+    if totals['errors']:
+        print(f"Could not estimate {totals['errors']} job(s).")
+
+# === Incremental Build Manifest ==================================
+# Bump whenever a change to the processing alters the output, so that --incremental rebuilds everything.
+TOOL_VERSION = 3
+MANIFEST_NAME = '.copyAndExtendSamples-manifest.sqlite'
+# Settings that change the content of the output (and therefore invalidate earlier builds).
+OUTPUT_SETTINGS = ('mono_backend', 'dither_seed', 'noise_shaping')
+
+def hash_file(file_path, block_size=1 << 20):
+    """
+    Return a content hash of a file, read in blocks.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(os.fsencode(file_path), 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def job_sources(job):
+    """
+    Return the source files a job reads.
+    """
+    if job[0] == 'sample_set':
+        return [src for _, src in job[2]]
+    return [job[1]]
+
+def job_outputs(job):
+    """
+    Return every file a job is expected to write.
+    """
+    if job[0] == 'sample_set':
+        base, candidates, copies, missing, out_dir, mono_dir = job[1:]
+        names = [new_fname for _, new_fname in copies] + [new_fname for _, new_fname in missing]
+        return [os.path.join(root, new_fname) for new_fname in names for root in (out_dir, mono_dir)]
+    return [job[2], job[3]]
+
+class BuildManifest:
+    """
+    SQLite record of what produced each output, kept in the output root.
+    
+    Every job gets a fingerprint built from the tool version, the output-affecting settings, the job's
+    destinations and parameters, and the content hash of each source it reads. A job whose fingerprint
+    matches the last successful build (and whose outputs all exist) does not need to run again.
+    Content hashes are cached by file size and modification time, so an unchanged library is only stat'ed.
+    """
+    def __init__(self, output_root):
+        self.output_root = output_root
+        self.db = sqlite3.connect(os.path.join(output_root, MANIFEST_NAME))
+        self.db.execute("CREATE TABLE IF NOT EXISTS sources "
+                        "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS jobs (job_key TEXT PRIMARY KEY, fingerprint TEXT)")
+        self.hashes = {path: (size, mtime_ns, digest)
+                       for path, size, mtime_ns, digest in self.db.execute("SELECT * FROM sources")}
+        self.fingerprints = dict(self.db.execute("SELECT * FROM jobs"))
+        self.pending = 0
+        # Stats of sources already taken by the directory scan, by path.
+        self.known_stats = {}
+
+    def relative(self, path):
+        """
+        Return path relative to the output root, so the manifest survives a change of working directory.
+        """
+        return os.path.relpath(path, self.output_root)
+
+    def source_hash(self, file_path):
+        """
+        Return the content hash of a source, rehashing it only if its size or mtime changed.
+        """
+        st = self.known_stats.get(file_path) or os.stat(os.fsencode(file_path))
+        key = os.path.abspath(file_path)
+        cached = self.hashes.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        with PROFILER.stage('hash', file_path, bytes_read=st.st_size):
+            digest = hash_file(file_path)
+        self.hashes[key] = (st.st_size, st.st_mtime_ns, digest)
+        self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                        (key, st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+    def job_key(self, job):
+        """
+        Return the stable identity of a job: its kind and primary destination.
+        """
+        if job[0] == 'sample_set':
+            return f"sample_set:{self.relative(os.path.join(job[5], job[1]))}"
+        return f"{job[0]}:{self.relative(job[2])}"
+
+    def fingerprint(self, job, settings):
+        """
+        Return the fingerprint of a job as it would run now.
+        """
+        if job[0] == 'sample_set':
+            base, candidates, copies, missing, out_dir, mono_dir = job[1:]
+            signature = [base, self.relative(mono_dir), [midi for midi, _ in candidates],
+                         [new_fname for _, new_fname in copies], missing]
+        else:
+            signature = [self.relative(job[3])]
+        sources = [self.source_hash(src) for src in job_sources(job)]
+        payload = json.dumps([TOOL_VERSION, job[0], signature, sources,
+                              {name: settings[name] for name in OUTPUT_SETTINGS}])
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+    def is_current(self, job, fingerprint):
+        """
+        Return True if the job last succeeded with the same fingerprint and all of its outputs still exist.
+        """
+        return (self.fingerprints.get(self.job_key(job)) == fingerprint and
+                all(os.path.exists(path) for path in job_outputs(job)))
+
+    def is_recorded(self, job):
+        """
+        Return True if the manifest knows which build produced the job's outputs.
+        """
+        return self.job_key(job) in self.fingerprints
+
+    def record(self, job, fingerprint):
+        """
+        Remember that the job succeeded with the given fingerprint.
+        """
+        key = self.job_key(job)
+        self.fingerprints[key] = fingerprint
+        self.db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?)", (key, fingerprint))
+        self.pending += 1
+        if self.pending >= 500:
+            self.commit()
+
+    def commit(self):
+        """
+        Flush recorded hashes and fingerprints to disk.
+        """
+        self.db.commit()
+        self.pending = 0
+
+    def close(self):
+        """
+        Commit and close the manifest database.
+        """
+        self.commit()
+        self.db.close()
+
+def filter_current_jobs(jobs, manifest, settings):
+    """
+    Drop the jobs whose outputs are up to date according to the manifest.
+    
+    Returns (jobs_to_run, fingerprints). Outputs of jobs whose recorded fingerprint no longer matches
+    are removed first, so that --skip-existing cannot keep a stale file.
+    """
+    to_run = []
+    fingerprints = {}
+    for job in jobs:
+        try:
+            fingerprint = manifest.fingerprint(job, settings)
+        except OSError as e:
+            print(f"Warning: Could not hash sources of {describe_job(job)}: {e}")
+            to_run.append(job)
+            continue
+        if manifest.is_current(job, fingerprint):
+            continue
+        if manifest.is_recorded(job):
+            for path in job_outputs(job):
+                if os.path.exists(path):
+                    os.remove(path)
+        fingerprints[manifest.job_key(job)] = fingerprint
+        to_run.append(job)
+    manifest.commit()
+    return to_run, fingerprints
+
+# === Resumable Job Queue =========================================
+QUEUE_NAME = '.copyAndExtendSamples-queue.sqlite'
+
+def encode_job(job):
+    """
+    Serialize a job as JSON text (ASCII, so undecodable file names survive).
+    """
+    return json.dumps(job)
+
+def decode_job(text):
+    """
+    Rebuild a job from encode_job's text, with the tuples it was planned with.
+    """
+    job = json.loads(text)
+    if job[0] == 'sample_set':
+        base, candidates, copies, missing, out_dir, mono_dir = job[1:]
+        return ('sample_set', base, [tuple(c) for c in candidates], [tuple(c) for c in copies],
+                [tuple(m) for m in missing], out_dir, mono_dir)
+    return tuple(job)
+
+def remove_partial_outputs(jobs):
+    """
+    Delete the unfinished temporary files a killed run may have left for the outputs of jobs.
+    """
+    removed = 0
+    for job in jobs:
+        for path in job_outputs(job):
+            if os.path.lexists(partial_path(path)):
+                os.remove(partial_path(path))
+                removed += 1
+    if removed:
+        print(f"Removed {removed} partial file(s) left by an interrupted run.")
+
+class JobQueue:
+    """
+    SQLite record of the jobs of a --resume run and their state, kept in the output root.
+    
+    Every planned job is stored as pending; it becomes running when handed to a worker and done or
+    failed when it returns. State changes are committed at once, so after a crash or power loss
+    --resume can pick up the unfinished jobs without walking the library or planning again. The queue
+    is removed once all its jobs are done (see remove_job_queue).
+    The plan (roots, note range and output settings) is stored with the jobs so that a resumed run
+    cannot silently mix in different options.
+    """
+    def __init__(self, output_root):
+        self.db = sqlite3.connect(os.path.join(output_root, QUEUE_NAME))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS queue (seq INTEGER PRIMARY KEY, job TEXT, state TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS plan (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+        self.seqs = {}
+
+    def unfinished(self):
+        """
+        Return the jobs not done yet (pending, running or failed), in planning order.
+        """
+        jobs = []
+        for seq, text in self.db.execute("SELECT seq, job FROM queue WHERE state != 'done' ORDER BY seq"):
+            job = decode_job(text)
+            self.seqs[id(job)] = seq
+            jobs.append(job)
+        return jobs
+
+    def stored_plan(self):
+        """
+        Return the plan the queued jobs were made with, or None if there is no queue.
+        """
+        row = self.db.execute("SELECT value FROM plan WHERE key = 'plan'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def total(self):
+        """
+        Return the number of queued jobs, finished or not.
+        """
+        return self.db.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def reset(self, jobs, plan):
+        """
+        Replace the queue with jobs, all pending, made with plan.
+        """
+        with self.db:
+            self.db.execute("DELETE FROM queue")
+            self.db.execute("INSERT OR REPLACE INTO plan VALUES ('plan', ?)", (json.dumps(plan),))
+            for seq, job in enumerate(jobs):
+                self.db.execute("INSERT INTO queue VALUES (?, ?, 'pending')", (seq, encode_job(job)))
+                self.seqs[id(job)] = seq
+
+    def set_state(self, job, state):
+        """
+        Record and commit the state of a queued job.
+        """
+        with self.db:
+            self.db.execute("UPDATE queue SET state = ? WHERE seq = ?", (state, self.seqs[id(job)]))
+
+    def close(self):
+        self.db.close()
+
+def remove_job_queue(output_root):
+    """
+    Delete the job queue of output_root and its SQLite journal files.
+    """
+    for suffix in ('', '-wal', '-shm'):
+        path = os.path.join(output_root, QUEUE_NAME + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+def run_plan(input_root, mono_output_root, note_range_midi, settings):
+    """
+    Return what a queue must have been planned with to be resumed by this run.
+    """
+    return {'tool_version': TOOL_VERSION, 'input_root': os.path.abspath(input_root),
+            'mono_output_root': os.path.abspath(mono_output_root), 'note_range': note_range_midi,
+            'settings': {name: settings[name] for name in OUTPUT_SETTINGS}}
+
+def process_directory(input_root, output_root, mono_output_root, note_range_midi, skip_existing, num_jobs=1,
+                      incremental=False, plan_format=None, pipeline_workers=0, resume=False,
+                      scan_threads=SCAN_THREADS):
+    """
+    Plan every job under input_root and run them, serially, with num_jobs worker processes, or
+    through the I/O pipeline with pipeline_workers compute threads.
+    
+    With resume, the jobs and their progress are kept in a queue in output_root, and the unfinished
+    jobs of an interrupted run are run again instead of planning anew; the queue is deleted once every
+    job is done. With incremental, a manifest in output_root
+    limits the run to jobs whose sources, parameters or tool version changed since they last succeeded.
+    With plan_format ('text' or 'json'), the jobs are only planned and printed with their estimated cost;
+    nothing is renamed, created or processed.
+    """
+    if plan_format:
+        if plan_format == 'json':
+            # Keep stdout valid JSON: planning messages go to stderr.
+            with contextlib.redirect_stdout(sys.stderr):
+                jobs = plan_jobs(input_root, output_root, mono_output_root, note_range_midi, dry_run=True,
+                                 scan_threads=scan_threads)
+        else:
+            jobs = plan_jobs(input_root, output_root, mono_output_root, note_range_midi, dry_run=True,
+                             scan_threads=scan_threads)
+        print_plan(jobs, plan_format)
+        return
+    settings = current_settings()
+    plan = run_plan(input_root, mono_output_root, note_range_midi, settings)
+    if not resume and os.path.exists(os.path.join(output_root, QUEUE_NAME)):
+        # A queue left by an interrupted --resume run: clean up after it, it will not be resumed.
+        job_queue = JobQueue(output_root)
+        remove_partial_outputs(job_queue.unfinished())
+        job_queue.close()
+        remove_job_queue(output_root)
+    job_queue = JobQueue(output_root) if resume else None
+    manifest = BuildManifest(output_root) if incremental else None
+    try:
+        stored_plan = job_queue.stored_plan() if job_queue else None
+        if stored_plan is not None:
+            if stored_plan != json.loads(json.dumps(plan)):
+                print("Cannot resume: the queued jobs were planned with a different input, note range, "
+                      "output settings or tool version. Run again without --resume.")
+                return
+            to_run = job_queue.unfinished()
+            print(f"Resuming {len(to_run)} unfinished of {job_queue.total()} queued job(s).")
+            remove_partial_outputs(to_run)
+            fingerprints = {}
+            if manifest:
+                for job in to_run:
                     try:
-                        convert_file_to_mono(dst, mono_dst, skip_existing)
-                    except Exception as e:
-                        print(f"Error converting '{safe_str(dst)}' to mono: {e}")
+                        fingerprints[manifest.job_key(job)] = manifest.fingerprint(job, settings)
+                    except OSError as e:
+                        print(f"Warning: Could not hash sources of {describe_job(job)}: {e}")
+        else:
+            with PROFILER.stage('walk', input_root):
+                jobs = plan_jobs(input_root, output_root, mono_output_root, note_range_midi,
+                                 scan_threads=scan_threads,
+                                 source_stats=manifest.known_stats if manifest else None)
+            if manifest:
+                to_run, fingerprints = filter_current_jobs(jobs, manifest, settings)
+                print(f"{len(jobs) - len(to_run)} of {len(jobs)} job(s) up to date; running {len(to_run)}.")
+            else:
+                to_run = jobs
+            if job_queue:
+                job_queue.reset(to_run, plan)
+
+        def record_result(job, ok):
+            if job_queue:
+                job_queue.set_state(job, 'done' if ok else 'failed')
+            if manifest is None:
+                return
+            fingerprint = fingerprints.get(manifest.job_key(job))
+            # Jobs report per-file errors without failing, so only trust a job whose outputs all exist.
+            if ok and fingerprint and all(os.path.exists(path) for path in job_outputs(job)):
+                manifest.record(job, fingerprint)
+                # Commit now: a job the queue marks done is not run again by --resume.
+                manifest.commit()
+
+        failed = run_jobs(to_run, skip_existing, num_jobs, record_result, pipeline_workers,
+                          on_start=(lambda job: job_queue.set_state(job, 'running')) if job_queue else None)
+        if failed:
+            print(f"{failed} of {len(to_run)} job(s) failed." + (" Run again with --resume to retry them."
+                                                                  if job_queue else ""))
+    finally:
+        if job_queue:
+            finished = not job_queue.unfinished()
+            job_queue.close()
+            if finished:
+                remove_job_queue(output_root)
+        if manifest:
+            manifest.close()
 
 def main():
     parser = argparse.ArgumentParser(
         description="Process .wav samples: copy folder structure, generate pitch‑shifted samples via Rubberband, "
-                    "and mirror the output in a second tree with high‑quality mono conversion (loop markers preserved). "
+                    "and mirror the output in a second tree with dithered mono conversion (loop markers preserved). "
                     "Optional flags: --note-range for pitched instruments, --skip-existing to avoid reprocessing."
     )
     parser.add_argument("input_root", help="Input root directory to search for samples")
@@ -507,6 +2159,45 @@ def main():
     parser.add_argument("mono_output_root", help="Output root directory for high‑quality mono‑converted samples")
     parser.add_argument("--note-range", help="Optional note range (e.g. 'C1-F4') to fill in missing notes. Omit for non‑pitched samples.")
     parser.add_argument("--skip-existing", action="store_true", help="Skip processing if destination file exists.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Number of worker processes (default 1 runs serially; 0 uses every CPU core).")
+    parser.add_argument("--pipeline", type=int, default=0, metavar="THREADS",
+                        help="Run in one process with a reader thread prefetching sources, THREADS compute threads and "
+                             "a writer thread, overlapping disk or network I/O with processing (cannot be combined with --jobs).")
+    parser.add_argument("--pitch-backend", choices=['auto'] + sorted(PITCH_BACKENDS), default='auto',
+                        help="How audio is handed to Rubberband: in-memory files (memfd, Linux) or temporary files on disk.")
+    parser.add_argument("--mono-backend", choices=['native', 'sox'], default='native',
+                        help="Make mono copies by downmixing in memory, or with SoX as a reference.")
+    parser.add_argument("--pitch-cache", metavar="DIR",
+                        help="Folder for an on-disk cache of pitch-shifted audio, shared across runs and output roots.")
+    parser.add_argument("--pitch-cache-size", default="10G",
+                        help="Size cap of the pitch cache (e.g. 500M, 10G); least recently used entries are evicted.")
+    parser.add_argument("--seed", type=int,
+                        help="Seed for the dither noise, making the output reproducible (default: random every run).")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default='copy',
+                        help="How non‑wav files are put in both output roots: plain copies, hard links to the source "
+                             "(shared data), reflinks (copy‑on‑write clones on btrfs/XFS), or auto (reflink, then an "
+                             "in‑kernel copy, then a plain copy).")
+    parser.add_argument("--noise-shaping", action="store_true",
+                        help="Use first-order highpass-shaped TPDF dither, moving the noise towards high frequencies.")
+    parser.add_argument("--stream-threshold", type=float, default=STREAM_THRESHOLD_SECONDS, metavar="SECONDS",
+                        help="Stream files longer than this block by block with bounded memory (negative disables).")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Time every stage (walk, decode, pitch shift, dither, encode, smpl embed, mono) per file, "
+                             "write the records to REPORT (CSV if it ends in .csv, JSON otherwise) and print a summary.")
+    parser.add_argument("--plan", nargs='?', const='text', choices=['text', 'json'],
+                        help="Dry run: print the planned jobs (copies, dithers, mono conversions, pitch shifts) with "
+                             "estimated bytes read/written and CPU seconds, as text or JSON, without touching any audio.")
+    parser.add_argument("--scan-threads", type=int, default=SCAN_THREADS, metavar="N",
+                        help=f"Number of threads listing the input folders and creating the output folders "
+                             f"(default: {SCAN_THREADS}; raise it for network shares).")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"Keep the jobs in a queue ({QUEUE_NAME}) in OUTPUT_ROOT while they run, deleted once they "
+                             "are all done. If an interrupted --resume run left one, run only its unfinished jobs, "
+                             "without walking the library again.")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Keep a manifest ({MANIFEST_NAME}) in OUTPUT_ROOT and only rebuild outputs whose sources, "
+                             "parameters or tool version changed.")
     args = parser.parse_args()
 
     if args.note_range:
@@ -518,7 +2209,32 @@ def main():
     else:
         note_range_midi = None
 
-    process_directory(args.input_root, args.output_root, args.mono_output_root, note_range_midi, args.skip_existing)
+    try:
+        pitch_cache_max_bytes = parse_size(args.pitch_cache_size)
+    except ValueError as e:
+        print(f"Error parsing pitch cache size: {e}")
+        return
+    settings = {'pitch_backend': args.pitch_backend, 'mono_backend': args.mono_backend,
+                'pitch_cache_dir': args.pitch_cache, 'pitch_cache_max_bytes': pitch_cache_max_bytes,
+                'dither_seed': args.seed, 'noise_shaping': args.noise_shaping,
+                'output_roots': (os.path.abspath(args.output_root), os.path.abspath(args.mono_output_root)),
+                'stream_threshold_seconds': args.stream_threshold if args.stream_threshold >= 0 else None,
+                'link_mode': args.link_mode,
+                'profile': bool(args.profile) and not args.plan}
+    configure_worker(settings)
+    num_jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.pipeline > 0 and num_jobs > 1:
+        print("Error: --pipeline runs in a single process and cannot be combined with --jobs.")
+        return
+    if not args.plan:
+        os.makedirs(args.output_root, exist_ok=True)
+    process_directory(args.input_root, args.output_root, args.mono_output_root, note_range_midi,
+                      args.skip_existing, num_jobs, args.incremental, args.plan, args.pipeline, args.resume,
+                      args.scan_threads)
+    if PROFILER.enabled:
+        PROFILER.write_report(args.profile)
+        print(PROFILER.summary())
+        print(f"Profile written to '{safe_str(args.profile)}'.")
 
 if __name__ == "__main__":
     main()
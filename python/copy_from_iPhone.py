@@ -1,9 +1,11 @@
 import os
-import shutil
 import sys
+import argparse
 from datetime import datetime
 
-def copy_files(source_folder, destination_folder):
+from link_copy import LINK_MODES, link_or_copy
+
+def copy_files(source_folder, destination_folder, link_mode='copy'):
     for root, dirs, files in os.walk(source_folder):
         for file in files:
             if file.lower().endswith(('.jpg', '.mov', '.heic')):
@@ -29,16 +31,20 @@ def copy_files(source_folder, destination_folder):
                     destination_path = os.path.join(destination_subfolder, f"{file_name}_{counter:02d}{file_extension}")
                     counter += 1
                 else:
-                    shutil.copy2(source_path, destination_path)
-                    print(f"Copied {source_path} to {destination_path}")
+                    method = link_or_copy(source_path, destination_path, link_mode)
+                    print(f"Copied {source_path} to {destination_path}" + (f" ({method})" if method != 'copy' else ""))
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Usage: python script.py <source_folder> <destination_folder>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Copy photos and videos into YYYY-MM folders by modification time.")
+    parser.add_argument("source_folder")
+    parser.add_argument("destination_folder")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default='copy',
+                        help="Plain copies, hard links (shared data), reflinks (copy-on-write clones on btrfs/XFS), "
+                             "or auto (reflink, then in-kernel copy, then plain copy)")
+    args = parser.parse_args()
 
-    source_folder = sys.argv[1]
-    destination_folder = sys.argv[2]
+    source_folder = args.source_folder
+    destination_folder = args.destination_folder
 
     if not os.path.exists(source_folder):
         print(f"Source folder '{source_folder}' does not exist.")
@@ -48,4 +54,4 @@ if __name__ == '__main__':
         os.makedirs(destination_folder)
         print(f"Created destination folder '{destination_folder}'.")
 
-    copy_files(source_folder, destination_folder)
+    copy_files(source_folder, destination_folder, args.link_mode)
@@ -3,7 +3,7 @@
 extract_samples.py - Improved Version in Python
 
 Usage:
-    python extractGigSamples.py /path/to/source /path/to/destination
+    python extractGigSamples.py /path/to/source /path/to/destination [--link-mode {copy,hardlink,reflink,auto}]
 
 This script recursively walks the source directory and reproduces its folder structure in the destination.
 For each .gig file found, it creates a folder (named after the file without its extension) in the corresponding destination.
@@ -12,15 +12,18 @@ The script then removes numeric prefixes from the extracted .wav files and sanit
 replacing any non-US English character (outside a–z, A–Z, 0–9, period, hash, underscore, and hyphen) with a hyphen (`-`).
 
 Any file conflicts are resolved by appending a counter to the filename.
+Other files are copied as they are; --link-mode lets them be hard linked or reflinked (cloned) instead.
 """
 
 import os
 import sys
-import shutil
+import argparse
 import subprocess
 import re
 import string
 
+from link_copy import LINK_MODES, link_or_copy
+
 ERROR_LOG_FILE = 'errors.txt'
 
 def log_error(message):
@@ -63,12 +66,12 @@ def get_unique_file_path(directory, file_name):
 
     return file_path
 
-def process_directory(src_dir, dest_dir):
+def process_directory(src_dir, dest_dir, link_mode='copy'):
     """
     Processes a single directory by:
       - Reproducing the directory structure in dest_dir with sanitized names.
       - Processing .gig files and extracting their samples.
-      - Copying other files while ensuring safe file names.
+      - Copying other files while ensuring safe file names (linked or cloned as link_mode allows).
     """
     os.makedirs(dest_dir, exist_ok=True)
     try:
@@ -83,7 +86,7 @@ def process_directory(src_dir, dest_dir):
         dest_path = os.path.join(dest_dir, sanitized_item_name)
 
         if item.is_dir():
-            process_directory(src_path, dest_path)
+            process_directory(src_path, dest_path, link_mode)
         elif item.is_file():
             # Check for .gig file (case-insensitive)
             if item.name.lower().endswith('.gig'):
@@ -121,18 +124,23 @@ def process_directory(src_dir, dest_dir):
                 # For non-.gig files, copy them safely to the destination
                 try:
                     dest_file_path = get_unique_file_path(dest_dir, sanitized_item_name)
-                    shutil.copy2(src_path, dest_file_path)
-                    print(f"Copied file: {src_path} -> {dest_file_path}")
+                    method = link_or_copy(src_path, dest_file_path, link_mode)
+                    print(f"Copied file ({method}): {src_path} -> {dest_file_path}")
                 except Exception as copy_err:
                     log_error(f"Error copying file {src_path}: {copy_err}")
 
 def main():
-    if len(sys.argv) < 3:
-        sys.stderr.write("Usage: python extract_samples.py <source directory> <destination directory>\n")
-        sys.exit(1)
-
-    src_root = os.path.abspath(sys.argv[1])
-    dest_root = os.path.abspath(sys.argv[2])
+    parser = argparse.ArgumentParser(
+        description="Extract the samples of every .gig file under a source folder into a sanitized copy of its structure.")
+    parser.add_argument("source", help="Source directory")
+    parser.add_argument("destination", help="Destination directory")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default='copy',
+                        help="How other files are copied: plain copies, hard links (shared data), reflinks "
+                             "(copy-on-write clones on btrfs/XFS), or auto (reflink, then in-kernel copy, then plain copy)")
+    args = parser.parse_args()
+
+    src_root = os.path.abspath(args.source)
+    dest_root = os.path.abspath(args.destination)
 
     if not os.path.exists(src_root):
         sys.stderr.write(f"Source directory does not exist: {src_root}\n")
@@ -140,7 +148,7 @@ def main():
 
     print(f"Starting processing:\n  Source: {src_root}\n  Destination: {dest_root}")
 
-    process_directory(src_root, dest_root)
+    process_directory(src_root, dest_root, args.link_mode)
 
     print("Processing complete.")
 
@@ -1,116 +1,230 @@
 import argparse
 import os
-import re
-import numpy as np
-from scipy.io import wavfile
+import io
+import contextlib
+import itertools
+import concurrent.futures
 from pathlib import Path
 
+from lite_wav import (NORMALIZE_MODES, PEAK_INDEX_NAME, PeakIndex, lite_rate, normalization_peaks, open_wav,
+                      scan_peak, write_lite)
+from sfz_index import SfzIndex, apply_edits, lite_name
+from stage_profiler import StageProfiler
+from tpdf_dither import file_rng
+
+# Per-stage timings, recorded only with --profile
+PROFILER = StageProfiler()
+# Seed for the dither noise (None: random every run), set with --seed
+DITHER_SEED = None
+# Highest sample rate of the lite WAVs (None: keep every source's rate), set with --target-rate
+TARGET_RATE = None
+
 # ------------------------- Audio Processing -------------------------
-def apply_tpdf_dither(data, bit_depth):
-    lsb = 1.0 / (2 ** (bit_depth - 1))
-    dither = np.random.uniform(-lsb, lsb, data.shape) 
-    dither += np.random.uniform(-lsb, lsb, data.shape)
-    return data + dither
-
-def convert_to_mono(data):
-    if data.ndim == 2 and data.shape[1] == 2:
-        if data.dtype.kind == 'i':
-            float_data = data.astype(np.float64)
-            mono = np.mean(float_data, axis=1)
-            mono = np.round(mono).astype(data.dtype)
-        else:
-            mono = np.mean(data, axis=1)
-        return mono
-    return data
-
-def process_wav(input_path, output_path):
+def process_wav(input_path, output_path, peak_value=None, output_root=None):
+    """Convert a WAV to 16-bit mono block by block (see lite_wav.py); returns 'created', 'skipped' or 'failed'"""
     try:
-        rate, data = wavfile.read(input_path)
+        source = open_wav(input_path)
     except Exception as e:
         print(f"Error reading {input_path}: {e}")
-        return False
+        return 'failed'
 
-    # Skip if already 16-bit mono
-    if data.dtype == np.int16 and (data.ndim == 1 or data.shape[1] == 1):
+    # Skip if already 16-bit mono (at or below the target rate)
+    rate = lite_rate(source.rate, TARGET_RATE)
+    if source.is_16bit_mono() and rate == source.rate:
         print(f"Skipped (already 16-bit mono): {input_path}")
-        return False
+        return 'skipped'
 
-    # Process audio
-    mono_data = convert_to_mono(data)
-    
-    # Convert to 16-bit with dithering
-    target_dtype = np.int16
-    max_int16 = np.iinfo(target_dtype).max
-    
-    if mono_data.dtype == np.float32:
-        scaled = mono_data * max_int16
-    elif mono_data.dtype == np.int32:
-        scaled = mono_data.astype(np.float64)
-        max_val = np.max(np.abs(scaled))
-        if max_val > 0:
-            scaled *= max_int16 / max_val
-    else:
-        scaled = mono_data.astype(np.float64)
-    
-    dithered = apply_tpdf_dither(scaled, 16)
-    converted = dithered.clip(-max_int16, max_int16).astype(target_dtype)
-
-    # Save output
+    # Convert to 16-bit mono with dithering, resample if needed and save output
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     try:
-        wavfile.write(output_path, rate, converted)
+        write_lite(source, output_path, file_rng(DITHER_SEED, output_path, root=output_root), requantize_other=True,
+                   peak_value=peak_value, rate=rate, profiler=PROFILER)
         print(f"Created lite WAV: {output_path}")
-        return True
+        return 'created'
     except Exception as e:
         print(f"Error writing {output_path}: {e}")
-        return False
+        return 'failed'
 
 # ------------------------- SFZ Processing -------------------------
-def process_sfz(input_path, output_path):
+# Tokens of the SFZ files and of the files they include, read once per run
+SFZ_INDEX = SfzIndex()
+# Text of the lite copies of included files written so far, by included file
+WRITTEN_INCLUDES = {}
+
+def sample_rate(path):
+    """Return the sample rate of a WAV, or None if it cannot be read"""
+    try:
+        return open_wav(path).rate
+    except Exception:
+        return None
+
+def produced_rates(input_path):
+    """Return (source rate, lite rate) of a WAV converted in this run"""
+    source_rate = sample_rate(input_path)
+    if source_rate is None:
+        return None, None
+    return source_rate, lite_rate(source_rate, TARGET_RATE)
+
+def write_lite_include(include_path, edits, input_root, output_root):
+    """Write the lite copy of a file included by an SFZ; returns False if it cannot be written"""
+    output_path = lite_output_path(include_path, output_root, input_root)
+    if os.path.relpath(include_path, input_root).startswith(os.pardir):
+        print(f"Error writing {output_path}: {include_path} is outside the input directory")
+        return False
+    content = apply_edits(SFZ_INDEX.text(include_path), edits)
+    written = WRITTEN_INCLUDES.get(include_path)
+    if written is not None:
+        if written != content:
+            # Included again with other definitions: the first copy is kept
+            print(f"Warning: kept the first lite copy of {include_path}, which another SFZ includes differently")
+        return True
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with PROFILER.stage('sfz', include_path, bytes_written=len(content)):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    WRITTEN_INCLUDES[include_path] = content
+    print(f"Created lite SFZ include: {output_path}")
+    return True
+
+def process_sfz(input_path, output_path, produced, input_root, output_root):
+    """Point an SFZ and its includes at the WAVs produced in this run; returns 'created' or 'failed'"""
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        with PROFILER.stage('sfz', input_path) as record:
+            edits = SFZ_INDEX.plan_edits(input_path, produced)
+            content = SFZ_INDEX.text(input_path)
+            record['bytes_read'] += len(content)
     except Exception as e:
         print(f"Error reading {input_path}: {e}")
-        return False
+        return 'failed'
 
-    # Update sample references
-    updated_content = re.sub(
-        r'(\bsample\s*=\s*["\']?)(.*?)(\.wav\b)(["\']?)',
-        lambda m: f"{m.group(1)}{m.group(2)}_lite{m.group(3)}{m.group(4)}",
-        content,
-        flags=re.IGNORECASE
-    )
+    # Update the references to produced WAVs (and resampled positions), in the included files too
+    root_path = os.path.abspath(input_path)
+    updated_content = apply_edits(content, edits.pop(root_path))
 
     # Save processed SFZ
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        for include_path, include_edits in edits.items():
+            if not write_lite_include(include_path, include_edits, input_root, output_root):
+                return 'failed'
+        with PROFILER.stage('sfz', input_path, bytes_written=len(updated_content)):
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(updated_content)
         print(f"Created lite SFZ: {output_path}")
-        return True
+        return 'created'
     except Exception as e:
         print(f"Error writing {output_path}: {e}")
-        return False
+        return 'failed'
 
 # ------------------------- Main Logic -------------------------
-def process_item(input_path, output_root, input_root):
-    """Process either WAV or SFZ file"""
+def lite_output_path(input_path, output_root, input_root):
+    """Return where the lite version of a file goes: its place under output_root, with a _lite suffix"""
     # Generate output path
     rel_path = os.path.relpath(input_path, input_root)
     output_path = os.path.join(output_root, rel_path)
     
     # Add _lite suffix
-    dirname, filename = os.path.split(output_path)
-    base, ext = os.path.splitext(filename)
-    output_path = os.path.join(dirname, f"{base}_lite{ext}")
+    return lite_name(output_path, '_lite')
+
+def process_item(input_path, output_root, input_root, peak_value=None, produced=None):
+    """Process either WAV or SFZ file (SFZ given the WAVs produced); returns (status, bytes_saved)"""
+    output_path = lite_output_path(input_path, output_root, input_root)
     
     # Dispatch to appropriate processor
     if input_path.lower().endswith('.wav'):
-        return process_wav(input_path, output_path)
+        status = process_wav(input_path, output_path, peak_value, output_root)
     elif input_path.lower().endswith('.sfz'):
-        return process_sfz(input_path, output_path)
-    return False
+        status = process_sfz(input_path, output_path, produced or {}, input_root, output_root)
+    else:
+        return 'skipped', 0
+    if status != 'created':
+        return status, 0
+    return status, os.path.getsize(input_path) - os.path.getsize(output_path)
+
+# ------------------------- Process Pool -------------------------
+def init_worker(profile, seed, target_rate):
+    """Set up a pool worker (process-pool initializer)"""
+    global DITHER_SEED, TARGET_RATE
+    PROFILER.enabled = profile
+    DITHER_SEED = seed
+    TARGET_RATE = target_rate
+    # A forked worker inherits the parent's records; drop them
+    PROFILER.take()
+
+def start_pool(jobs):
+    """Start a pool of jobs worker processes with this process's settings"""
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                                  initargs=(PROFILER.enabled, DITHER_SEED, TARGET_RATE))
+
+def scan_item(input_path):
+    """Return the peak of a WAV (see lite_wav.scan_peak), or 'failed' if it cannot be read"""
+    try:
+        return scan_peak(input_path, profiler=PROFILER)
+    except Exception:
+        # The conversion pass reports the error
+        return 'failed'
+
+def scan_item_captured(input_path):
+    """Scan a WAV's peak in a pool worker, returning its stage timings with it"""
+    return scan_item(input_path), PROFILER.take()
+
+def scan_peaks(index, input_paths, jobs=1):
+    """Peak-scan pass: add the WAVs missing from the peak index, on a pool of jobs processes if jobs > 1"""
+    wav_paths = index.stale([path for path in input_paths if path.lower().endswith('.wav')])
+    if jobs <= 1 or len(wav_paths) <= 1:
+        results = [(scan_item(input_path), []) for input_path in wav_paths]
+    else:
+        with start_pool(jobs) as executor:
+            results = list(executor.map(scan_item_captured, wav_paths))
+    for input_path, (peak_value, profile_records) in zip(wav_paths, results):
+        PROFILER.merge(profile_records)
+        if peak_value != 'failed':
+            index.add(input_path, peak_value)
+    index.save()
+
+def run_item(input_path, output_root, input_root, peak_value=None, produced=None):
+    """Run process_item, counting an unexpected error as a failed file instead of stopping the run"""
+    try:
+        return process_item(input_path, output_root, input_root, peak_value, produced)
+    except Exception as e:
+        print(f"Error processing {input_path}: {e}")
+        return 'failed', 0
+
+def run_item_captured(input_path, output_root, input_root, peak_value=None):
+    """Run an item in a pool worker, returning its log and stage timings with its result"""
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        status, bytes_saved = run_item(input_path, output_root, input_root, peak_value)
+    return buffer.getvalue(), status, bytes_saved, PROFILER.take()
+
+def process_items(input_paths, output_root, input_root, jobs=1, peaks=None):
+    """Yield (input_path, status, bytes_saved) for every file in order, on a pool of jobs processes if jobs > 1
+
+    peaks gives the peak each 32-bit integer WAV is normalized to, by path (scanned from the file if missing)"""
+    peaks = peaks or {}
+    if jobs <= 1:
+        for input_path in input_paths:
+            status, bytes_saved = run_item(input_path, output_root, input_root, peaks.get(input_path))
+            yield input_path, status, bytes_saved
+        return
+    with start_pool(jobs) as executor:
+        results = executor.map(run_item_captured, input_paths,
+                               [output_root] * len(input_paths), [input_root] * len(input_paths),
+                               [peaks.get(input_path) for input_path in input_paths])
+        # Logs are printed in walk order, each file's as one block
+        for input_path, (log_text, status, bytes_saved, profile_records) in zip(input_paths, results):
+            print(log_text, end='', flush=True)
+            PROFILER.merge(profile_records)
+            yield input_path, status, bytes_saved
+
+def process_sfz_items(sfz_paths, output_root, input_root, produced):
+    """Yield (input_path, status, bytes_saved) for every SFZ in order, in this process (sharing SFZ_INDEX)
+
+    produced maps every WAV produced in this run to its (source rate, lite rate); it is read as the SFZ
+    files are processed, so it can be filled while the WAVs are"""
+    for input_path in sfz_paths:
+        status, bytes_saved = run_item(input_path, output_root, input_root, produced=produced)
+        yield input_path, status, bytes_saved
 
 def main():
     parser = argparse.ArgumentParser(
@@ -121,38 +235,83 @@ def main():
     parser.add_argument("output_folder", help="Target directory for lite versions")
     parser.add_argument("-r", "--recursive", action="store_true",
                         help="Process directories recursively")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (0 for one per CPU core)")
+    parser.add_argument("--seed", type=int,
+                        help="Seed for the dither noise, making the output reproducible (default: random every run)")
+    parser.add_argument("--target-rate", type=int,
+                        help="Resample WAVs above this sample rate (e.g. 44100 or 22050) down to it, rescaling "
+                             "their loop points and the positions in the SFZ files")
+    parser.add_argument("--normalize", choices=NORMALIZE_MODES, default='file',
+                        help="Normalize 32-bit integer WAVs to their own peak, or to the peak of their instrument "
+                             f"folder to keep the levels of its layers (peaks are cached in {PEAK_INDEX_NAME})")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Time each stage (walk, decode, mono, resample, dither, encode, sfz) per file and "
+                             "write the records to REPORT (CSV if it ends in .csv, JSON otherwise)")
     args = parser.parse_args()
 
     if not os.path.exists(args.input_folder):
         print(f"Error: Input directory {args.input_folder} does not exist")
         return
+    if args.target_rate is not None and args.target_rate <= 0:
+        print(f"Error: Invalid target rate {args.target_rate}")
+        return
 
     # Create output root directory
     Path(args.output_folder).mkdir(parents=True, exist_ok=True)
 
-    # Process files
-    processed_count = {'wav': 0, 'sfz': 0}
-    
-    for root, dirs, files in os.walk(args.input_folder):
+    # Collect files
+    global DITHER_SEED, TARGET_RATE
+    DITHER_SEED = args.seed
+    TARGET_RATE = args.target_rate
+    PROFILER.enabled = bool(args.profile)
+    input_paths = []
+    for root, dirs, files in PROFILER.iterate('walk', os.walk(args.input_folder), args.input_folder):
         for file in files:
             if file.lower().endswith(('.wav', '.sfz')):
-                input_path = os.path.join(root, file)
-                success = process_item(input_path, args.output_folder, args.input_folder)
-                
-                if success:
-                    if file.lower().endswith('.wav'):
-                        processed_count['wav'] += 1
-                    else:
-                        processed_count['sfz'] += 1
+                input_paths.append(os.path.join(root, file))
 
         if not args.recursive:
             dirs[:] = []
 
+    # Process files
+    processed_count = {'wav': 0, 'sfz': 0}
+    status_count = {'created': 0, 'skipped': 0, 'failed': 0}
+    bytes_saved = 0
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    index = PeakIndex(os.path.join(args.output_folder, PEAK_INDEX_NAME))
+    scan_peaks(index, input_paths, jobs)
+    peaks = normalization_peaks(index, input_paths, args.normalize)
+    # WAVs first, then the SFZ files, which only point at the WAVs actually produced
+    wav_paths = [path for path in input_paths if path.lower().endswith('.wav')]
+    sfz_paths = [path for path in input_paths if path.lower().endswith('.sfz')]
+    produced = {}
+    results = itertools.chain(
+        process_items(wav_paths, args.output_folder, args.input_folder, jobs, peaks),
+        process_sfz_items(sfz_paths, args.output_folder, args.input_folder, produced))
+    for input_path, status, saved in results:
+        status_count[status] += 1
+        bytes_saved += saved
+        if status == 'created':
+            if input_path.lower().endswith('.wav'):
+                processed_count['wav'] += 1
+                produced[os.path.abspath(input_path)] = produced_rates(input_path)
+            else:
+                processed_count['sfz'] += 1
+
     # Summary
     print(f"\nProcessing complete:")
     print(f"- Converted {processed_count['wav']} WAV files to 16-bit mono")
     print(f"- Processed {processed_count['sfz']} SFZ files")
+    print(f"- Created {status_count['created']}, skipped {status_count['skipped']}, "
+          f"failed {status_count['failed']} files")
+    print(f"- Saved {bytes_saved / 1e6:.1f} MB")
     print(f"Output directory: {args.output_folder}")
 
+    if PROFILER.enabled:
+        PROFILER.write_report(args.profile)
+        print(f"\n{PROFILER.summary()}")
+        print(f"Profile written to: {args.profile}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
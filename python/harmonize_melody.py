@@ -1,5 +1,9 @@
 import argparse
-from music21 import converter, instrument, note, chord, stream, key, meter, tempo, duration
+
+def load_music21():
+    """Import the music21 names used below; music21 takes seconds to load, so --help and bad arguments skip it."""
+    global converter, instrument, note, chord, stream, key, meter, tempo, duration
+    from music21 import converter, instrument, note, chord, stream, key, meter, tempo, duration
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Harmonize a monophonic MIDI file for piano with 'oom-pah' accompaniment.")
@@ -175,6 +179,7 @@ def main():
         raise ValueError("Mode must be 'major' or 'minor'.")
 
     # Create the key object
+    load_music21()
     user_key = key.Key(tonic, mode)
 
     # Load the melody
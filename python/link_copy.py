@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+link_copy.py
+
+File copies that let the filesystem do the work, shared by the copying scripts (their --link-mode option).
+
+Modes:
+  copy      Plain byte-for-byte copy with metadata (shutil.copy2).
+  hardlink  Hard link the destination to the source (instant, no extra space). Both names then share
+            the same data, so editing one edits the other. Falls back to a copy across filesystems.
+  reflink   Clone the source's extents (FICLONE on btrfs, XFS, bcachefs...): instant and copy-on-write,
+            so the files stay independent. Falls back to a copy where cloning is not supported.
+  auto      Try a reflink, then an in-kernel copy (os.copy_file_range, which NFS and some filesystems can
+            also do server-side or by sharing extents), then a plain copy.
+
+Every mode except hardlink leaves the destination with the source's permissions and timestamps, like
+shutil.copy2. When a filesystem pair turns out not to support a method, it is not tried again for it.
+
+Usage:
+    method = link_or_copy(src, dst, mode='auto')   # returns the method actually used
+"""
+
+import os                # For links, file descriptors and copy_file_range.
+import errno             # For telling unsupported operations from real errors.
+import shutil            # For plain copies and copying metadata.
+
+try:
+    import fcntl         # For the FICLONE ioctl (Unix only).
+except ImportError:
+    fcntl = None
+
+LINK_MODES = ('copy', 'hardlink', 'reflink', 'auto')
+
+# ioctl number of FICLONE on Linux (_IOW(0x94, 9, int)).
+FICLONE = 0x40049409
+
+# Errors meaning "this filesystem (pair) cannot do that", as opposed to a failure of this particular file.
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP,
+                      errno.ENOSYS, errno.EBADF, errno.EMLINK}
+
+# (method, source device, destination device) combinations known not to work.
+unsupported = set()
+
+def device_pair(src, dst):
+    """
+    Return the devices of src and of the folder dst goes in.
+    """
+    return os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+
+def reflink_file(src, dst):
+    """
+    Clone src into dst with the FICLONE ioctl, then copy its permissions and timestamps.
+    """
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+def copy_file_range_file(src, dst):
+    """
+    Copy src into dst inside the kernel with os.copy_file_range, then copy its permissions and timestamps.
+    """
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, 1 << 30))
+            if copied == 0:
+                break
+            remaining -= copied
+        if remaining > 0:
+            # The source shrank or the kernel stopped early; finish with a plain copy.
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copystat(src, dst)
+
+def hardlink_file(src, dst):
+    """
+    Hard link dst to src, replacing any existing dst atomically.
+    """
+    temp_path = f"{dst}.{os.getpid()}.link"
+    os.link(src, temp_path)
+    try:
+        os.replace(temp_path, dst)
+    except OSError:
+        os.remove(temp_path)
+        raise
+
+METHODS = {
+    'reflink': reflink_file,
+    'copy_file_range': copy_file_range_file,
+    'hardlink': hardlink_file,
+}
+
+# Methods tried, in order, before falling back to a plain copy.
+MODE_METHODS = {
+    'copy': (),
+    'hardlink': ('hardlink',),
+    'reflink': ('reflink',),
+    'auto': ('reflink', 'copy_file_range'),
+}
+
+def link_or_copy(src, dst, mode='copy'):
+    """
+    Copy src to dst using the fastest method mode allows, falling back to shutil.copy2.
+
+    Returns the method used: 'reflink', 'copy_file_range', 'hardlink' or 'copy'.
+    """
+    if mode not in MODE_METHODS:
+        raise ValueError(f"unknown link mode '{mode}' (expected one of {', '.join(LINK_MODES)})")
+    methods = MODE_METHODS[mode]
+    devices = device_pair(src, dst) if methods else None
+    for method in methods:
+        if (method,) + devices in unsupported:
+            continue
+        try:
+            METHODS[method](src, dst)
+            return method
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            unsupported.add((method,) + devices)
+    shutil.copy2(src, dst)
+    return 'copy'
@@ -0,0 +1,640 @@
+#!/usr/bin/env python3
+"""
+lite_wav.py
+
+Block-wise "lite" conversion of WAV files (stereo to mono, 16-bit with TPDF dither), shared by
+create-lite-samples.py and full-lite-workflow.py.
+
+The source's sample data is memory-mapped and converted a block of frames at a time (downmix,
+scaling, dither, quantization), and every block is written out before the next one is read, so the
+memory used does not grow with the file. The result is the same as converting the whole file at once
+the way the scripts used to (scipy.io.wavfile.read, float64 dither arrays, wavfile.write):
+
+  - stereo is averaged to mono (integer sources rounded back to their type); other layouts are kept;
+  - float32 is scaled by 32767; int32 (and 24-bit, read left-justified as scipy does) is normalized
+    to its peak, which takes a first pass over the file unless the peak is given; other types are
+    either passed through or converted as they are, depending on requantize_other;
+  - two uniform noises of ±1/32768 are added, then the samples are clipped to ±32767 and truncated to int16.
+
+The noise comes from a NumPy Generator: both noise arrays are drawn block by block, the second from a
+copy of the generator advanced past the first, so the numbers are the ones a whole-file draw would give.
+
+The peaks of int32 sources can be scanned ahead of the conversion and kept in a PeakIndex, a JSON
+sidecar in the output root that is reused while the files are unchanged. normalization_peaks then
+gives each file the peak it is scaled to: its own ('file'), or the loudest of its folder ('instrument'),
+which keeps the relative levels of an instrument's velocity layers.
+
+The output can also be brought down to a lower sample rate. The downmixed, scaled signal then goes
+through PolyphaseResampler before the dither; it filters a block at a time with the filter of
+scipy.signal.resample_poly, as matrix products, without loading scipy.signal (which takes longer to
+import than resampling most files).
+
+The metadata chunks of the source (smpl loops, cue points, LIST, inst, acid...) are copied to the lite
+file byte for byte, in their places before or after the audio data. Only the frame positions in 'smpl'
+and 'cue ' chunks are rescaled, and only when the output's sample rate differs from the source's.
+
+Usage:
+    source = open_wav(input_path)
+    if not source.is_16bit_mono():
+        write_lite(source, output_path, file_rng(seed, output_path, root=output_root), requantize_other=True)
+
+    index = PeakIndex(os.path.join(output_root, PEAK_INDEX_NAME))
+    for path in index.stale(wav_paths):
+        index.add(path, scan_peak(path))
+    index.save()
+    peaks = normalization_peaks(index, wav_paths, 'instrument')   # then write_lite(..., peak_value=peaks.get(path))
+"""
+
+import os                # For file sizes and removing unfinished outputs.
+import json              # For the peak index.
+import math              # For resampling ratios.
+import functools         # For caching resampling filters.
+import struct            # For RIFF headers.
+
+import numpy as np       # For numerical operations.
+
+from stage_profiler import StageProfiler
+
+# Number of frames converted at a time.
+BLOCK_FRAMES = 1 << 16
+# Full scale of the 16-bit output, and the half-width of each of the two dither noises.
+MAX_INT16 = np.iinfo(np.int16).max
+DITHER_LSB = 1.0 / (2 ** 15)
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Profiler used when the caller does not pass one.
+NO_PROFILER = StageProfiler()
+
+# Anti-aliasing filter of the resampler, as designed by scipy.signal.resample_poly: a Kaiser-windowed
+# sinc of 2 * RESAMPLE_HALF_LENGTH * max(up, down) + 1 taps (only the Kaiser window is supported).
+RESAMPLE_HALF_LENGTH = 10
+RESAMPLE_WINDOW = ('kaiser', 5.0)
+# Minimum number of output frames computed by one row of the resampler's matrix product.
+RESAMPLE_PERIOD_FRAMES = 32
+
+# Chunks that are not copied: the ones the writer makes itself (fmt, data, fact, ds64), the ones describing
+# the source's samples (PEAK: per-channel peaks of float data) and the ones that only pad the file.
+SKIPPED_CHUNKS = (b'fmt ', b'data', b'fact', b'ds64', b'PEAK', b'JUNK', b'PAD ')
+
+# Name of the peak index kept in the output root.
+PEAK_INDEX_NAME = '.lite-peaks.json'
+# How int32 sources are normalized: each file to its own peak, or every file of a folder to the folder's.
+NORMALIZE_MODES = ('file', 'instrument')
+
+# === Reading =====================================================
+class WavSource:
+    """
+    The sample data of a WAV file, read in blocks of frames as scipy.io.wavfile.read would return it.
+
+    chunks lists the file's metadata chunks as (chunk_id, offset, size, before_data), offset being where
+    the chunk's payload starts in path.
+    """
+    def __init__(self, rate, frames, channels, dtype, read_block, path=None, chunks=()):
+        self.rate = rate
+        self.frames = frames
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.read_block = read_block
+        self.path = path
+        self.chunks = list(chunks)
+
+    def block(self, start, stop):
+        """
+        Return frames start to stop: 1-D for mono, (frames, channels) otherwise.
+        """
+        return self.read_block(start, stop)
+
+    def is_16bit_mono(self):
+        return self.dtype == np.int16 and self.channels == 1
+
+def sample_dtype(format_tag, bits):
+    """
+    Return the NumPy type scipy reads a sample format as, or None if it needs scipy itself.
+    """
+    if format_tag == WAVE_FORMAT_PCM:
+        return {8: np.uint8, 16: np.int16, 24: np.int32, 32: np.int32, 64: np.int64}.get(bits)
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return {32: np.float32, 64: np.float64}.get(bits)
+    return None
+
+def find_chunks(f, file_size):
+    """
+    Return (fmt_chunk_data, data_offset, data_size, metadata_chunks) of an open little-endian RIFF/WAVE
+    file, or None. metadata_chunks is as in WavSource.
+    """
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+    fmt = None
+    data = None
+    chunks = []
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id, size = struct.unpack('<4sI', chunk_header)
+        offset = f.tell()
+        if offset + size > file_size:
+            # A truncated chunk ends the file: only the data chunk is kept (read up to the end).
+            if chunk_id == b'data' and data is None:
+                data = (offset, size)
+            break
+        if chunk_id == b'fmt ':
+            fmt = f.read(size)
+        elif chunk_id == b'data' and data is None:
+            data = (offset, size)
+        elif chunk_id not in SKIPPED_CHUNKS:
+            chunks.append((chunk_id, offset, size, data is None))
+        f.seek(offset + size + size % 2)
+    if not fmt or data is None:
+        return None
+    return fmt, data[0], data[1], chunks
+
+def open_wav(path):
+    """
+    Open a WAV file for block-wise reading, memory-mapping its sample data.
+
+    Formats this reader does not handle (RF64, big-endian RIFX, odd bit depths...) are read whole with
+    scipy.io.wavfile instead, which also raises the errors for files that are not valid WAVs; their
+    metadata chunks are not kept.
+    """
+    with open(path, 'rb') as f:
+        chunks = find_chunks(f, os.fstat(f.fileno()).st_size)
+    if chunks:
+        fmt, data_offset, data_size, metadata_chunks = chunks
+        format_tag, channels, rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        dtype = sample_dtype(format_tag, bits)
+        if dtype and channels > 0 and block_align == channels * bits // 8:
+            # A truncated data chunk is read up to the end of the file, as scipy does.
+            frames = min(data_size, os.path.getsize(path) - data_offset) // block_align
+            if frames == 0:
+                empty = np.zeros((0, channels), dtype=dtype)
+                return WavSource(rate, 0, channels, dtype,
+                                 lambda start, stop: empty[:, 0] if channels == 1 else empty, path, metadata_chunks)
+            raw = np.memmap(path, dtype=np.uint8 if bits == 24 else np.dtype(dtype).newbyteorder('<'),
+                            mode='r', offset=data_offset,
+                            shape=(frames, channels, 3) if bits == 24 else (frames, channels))
+
+            def read_block(start, stop):
+                if bits == 24:
+                    # Left-justify the 3 bytes of each sample in an int32, as scipy does.
+                    padded = np.zeros((stop - start, channels, 4), dtype=np.uint8)
+                    padded[..., 1:] = raw[start:stop]
+                    block = padded.view('<i4')[..., 0]
+                else:
+                    # Copy, so the pages are read here and not wherever the block is first used.
+                    block = np.array(raw[start:stop])
+                block = block.astype(dtype, copy=False)
+                return block[:, 0] if channels == 1 else block
+            return WavSource(rate, frames, channels, dtype, read_block, path, metadata_chunks)
+
+    from scipy.io import wavfile  # Imported on first use: scipy.io is slow to load.
+    rate, data = wavfile.read(path)
+    return WavSource(rate, len(data), 1 if data.ndim == 1 else data.shape[1], data.dtype,
+                     lambda start, stop: data[start:stop])
+
+# === Conversion ==================================================
+def convert_to_mono(data):
+    """
+    Average stereo to mono, rounding integer samples back to their type; other layouts are returned as is.
+    """
+    if data.ndim == 2 and data.shape[1] == 2:
+        if data.dtype.kind == 'i':
+            float_data = data.astype(np.float64)
+            mono = np.mean(float_data, axis=1)
+            mono = np.round(mono).astype(data.dtype)
+        else:
+            mono = np.mean(data, axis=1)
+        return mono
+    return data
+
+def iter_mono_blocks(source, block_frames=BLOCK_FRAMES, profiler=NO_PROFILER, path=None):
+    """
+    Yield the source downmixed to mono (see convert_to_mono), block_frames frames at a time.
+    """
+    for start in range(0, source.frames, block_frames):
+        stop = min(start + block_frames, source.frames)
+        with profiler.stage('decode', path) as record:
+            block = source.block(start, stop)
+            record['bytes_read'] += block.nbytes
+        with profiler.stage('mono', path):
+            block = convert_to_mono(block)
+        yield block
+
+def mono_layout(source):
+    """
+    Return (dtype, channels) of the source after convert_to_mono.
+    """
+    if source.channels != 2:
+        return source.dtype, source.channels
+    if source.dtype.kind == 'i':
+        return source.dtype, 1
+    return np.mean(np.zeros((1, 2), dtype=source.dtype), axis=1).dtype, 1
+
+def peak(source, block_frames=BLOCK_FRAMES, profiler=NO_PROFILER, path=None):
+    """
+    Return the largest absolute sample of the source after downmixing, as a float.
+    """
+    peak_value = 0.0
+    for block in iter_mono_blocks(source, block_frames, profiler, path):
+        if len(block):
+            peak_value = max(peak_value, float(np.max(np.abs(block.astype(np.float64)))))
+    return peak_value
+
+def scan_peak(path, block_frames=BLOCK_FRAMES, profiler=NO_PROFILER):
+    """
+    Return the peak write_lite normalizes a file to, or None if the file is not normalized (not int32).
+    """
+    source = open_wav(path)
+    if mono_layout(source)[0] != np.int32:
+        return None
+    return peak(source, block_frames, profiler, path)
+
+def split_noise(rng, count):
+    """
+    Return two generators drawing the first and the second of two consecutive runs of count doubles from rng.
+    """
+    first = np.random.Generator(type(rng.bit_generator)())
+    first.bit_generator.state = rng.bit_generator.state
+    second = np.random.Generator(type(rng.bit_generator)())
+    second.bit_generator.state = rng.bit_generator.state
+    # Each double takes one 64-bit output.
+    second.bit_generator.advance(count)
+    return first, second
+
+def lite_rate(source_rate, target_rate=None):
+    """
+    Return the sample rate of the lite version of a source: target_rate if it is lower, else the source's.
+    """
+    if target_rate is None or source_rate <= target_rate:
+        return source_rate
+    return target_rate
+
+def lite_dtype(source, requantize_other, rate=None):
+    """
+    Return the sample type write_lite gives the source at rate.
+    """
+    dtype, _ = mono_layout(source)
+    if dtype in (np.float32, np.int32) or requantize_other or rate not in (None, source.rate):
+        return np.dtype(np.int16)
+    return dtype
+
+def iter_lite_blocks(source, rng, requantize_other, peak_value=None, rate=None, block_frames=BLOCK_FRAMES,
+                     profiler=NO_PROFILER, path=None):
+    """
+    Yield the lite version of the source at rate (default: the source's) block by block (see the module docstring).
+
+    int32 sources are normalized to peak_value, scanned from the source first if it is None.
+    With requantize_other, sample types other than float32 and int32 are dithered to int16 as they are;
+    otherwise they are passed through after downmixing, unless they are resampled.
+    """
+    dtype, channels = mono_layout(source)
+    resampler = None
+    if rate not in (None, source.rate):
+        resampler = PolyphaseResampler(source.rate, rate, source.frames)
+    elif dtype not in (np.float32, np.int32) and not requantize_other:
+        yield from iter_mono_blocks(source, block_frames, profiler, path)
+        return
+    gain = None
+    if dtype == np.int32:
+        if peak_value is None:
+            peak_value = peak(source, block_frames, profiler, path)
+        if peak_value > 0:
+            gain = MAX_INT16 / peak_value
+
+    def scaled_blocks():
+        for block in iter_mono_blocks(source, block_frames, profiler, path):
+            with profiler.stage('dither', path):
+                if dtype == np.float32:
+                    scaled = block * MAX_INT16
+                else:
+                    scaled = block.astype(np.float64)
+                    if gain is not None:
+                        scaled *= gain
+            yield scaled
+
+    blocks = scaled_blocks()
+    frames = source.frames
+    if resampler is not None:
+        blocks = resampler.iter_blocks(blocks, profiler, path)
+        frames = resampler.frames_out
+    first, second = split_noise(rng, frames * channels)
+    for scaled in blocks:
+        with profiler.stage('dither', path):
+            dither = first.uniform(-DITHER_LSB, DITHER_LSB, scaled.shape)
+            dither += second.uniform(-DITHER_LSB, DITHER_LSB, scaled.shape)
+            lite = (scaled + dither).clip(-MAX_INT16, MAX_INT16).astype(np.int16)
+        yield lite
+
+# === Resampling ==================================================
+def resampled_frames(frames, source_rate, rate):
+    """
+    Return the length of a signal of frames frames at source_rate resampled to rate (rounded up).
+    """
+    return -(-frames * rate // source_rate)
+
+@functools.lru_cache(maxsize=None)
+def polyphase_filter(up, down):
+    """
+    Return (period_matrix, skip, taps_per_phase) for resampling by up / down.
+
+    The anti-aliasing filter is the one scipy.signal.resample_poly designs (firwin with RESAMPLE_WINDOW,
+    gain up), zero-padded in front the same way so the output frames are centered on it; skip is the
+    number of output frames of that delay. Its output repeats in periods of up (or a multiple of up)
+    output frames that each take down (times the same multiple) input frames, so one period is a matrix
+    product: period_matrix has a column per output frame of the period, and a row per input frame of the
+    window it reads, which starts taps_per_phase - 1 frames before the period's own input frames.
+    """
+    max_rate = max(up, down)
+    half_len = RESAMPLE_HALF_LENGTH * max_rate
+    offsets = np.arange(2 * half_len + 1) - half_len
+    taps = np.sinc(offsets / max_rate) / max_rate * np.kaiser(2 * half_len + 1, RESAMPLE_WINDOW[1])
+    taps *= up / taps.sum()
+    pre_pad = down - half_len % down
+    taps = np.concatenate((np.zeros(pre_pad), taps))
+    length = -(-len(taps) // up)
+    # Phase p of the filter: the taps applied to the input frames before output frames at n * up + p.
+    phases = np.concatenate((taps, np.zeros(length * up - len(taps)))).reshape(length, up).T
+    periods = -(-RESAMPLE_PERIOD_FRAMES // up)
+    outputs = periods * up
+    matrix = np.zeros(((outputs - 1) * down // up + length, outputs))
+    for output in range(outputs):
+        frame = output * down // up
+        matrix[frame:frame + length, output] = phases[output * down % up, ::-1]
+    return matrix, (half_len + pre_pad) // down, length
+
+class PolyphaseResampler:
+    """
+    Resample a signal of frames frames from source_rate to rate, block by block.
+
+    Only the output frames are computed, a block of them at a time as one matrix product of a strided
+    view of the input (see polyphase_filter). Every output frame is computed from all the input frames
+    it depends on, so whatever the block sizes the result matches scipy.signal.resample_poly on the
+    whole signal to rounding (the rounding itself can vary with the block sizes).
+    """
+    def __init__(self, source_rate, rate, frames):
+        divisor = math.gcd(source_rate, rate)
+        self.up = rate // divisor
+        self.down = source_rate // divisor
+        self.frames_out = resampled_frames(frames, source_rate, rate)
+        self.matrix, self.skip, self.length = polyphase_filter(self.up, self.down)
+        self.period_outputs = self.matrix.shape[1]
+        self.period_inputs = self.period_outputs * self.down // self.up
+
+    def first_input(self, output):
+        """
+        Return the first input frame of the window of the period holding output frame output.
+        """
+        period = (output + self.skip) // self.period_outputs
+        return max(0, period * self.period_inputs - self.length + 1)
+
+    def filter(self, buffer, buffer_start, start, stop):
+        """
+        Return output frames start to stop, computed from the input frames in buffer (buffer_start onwards;
+        frames past its end are taken as the zeros after the signal).
+        """
+        first_period = (start + self.skip) // self.period_outputs
+        periods = (stop - 1 + self.skip) // self.period_outputs - first_period + 1
+        low = first_period * self.period_inputs - self.length + 1
+        high = low + (periods - 1) * self.period_inputs + len(self.matrix)
+        segment = np.zeros((high - low,) + buffer.shape[1:])
+        begin, end = max(low, buffer_start), min(high, buffer_start + len(buffer))
+        if end > begin:
+            segment[begin - low:end - low] = buffer[begin - buffer_start:end - buffer_start]
+        windows = np.lib.stride_tricks.sliding_window_view(segment, len(self.matrix), axis=0)[::self.period_inputs]
+        # (periods, [channels,] window) @ (window, outputs) -> one row of output frames per period
+        y = windows @ self.matrix
+        if y.ndim == 3:
+            y = y.transpose(0, 2, 1)
+        y = y.reshape((-1,) + buffer.shape[1:])
+        offset = start + self.skip - first_period * self.period_outputs
+        return y[offset:offset + stop - start]
+
+    def iter_blocks(self, blocks, profiler=NO_PROFILER, path=None):
+        """
+        Yield the resampled signal for an iterable of float64 input blocks, as soon as each output frame's
+        inputs are in.
+        """
+        buffer = None
+        buffer_start = 0
+        output = 0
+        for block in blocks:
+            with profiler.stage('resample', path):
+                buffer = block if buffer is None else np.concatenate((buffer, block))
+                available = buffer_start + len(buffer)
+                # Output frame m depends on the input frames up to (m + skip) * down / up.
+                stop = min(self.frames_out, (available * self.up - 1) // self.down + 1 - self.skip)
+                resampled = None
+                if stop > output:
+                    resampled = self.filter(buffer, buffer_start, output, stop)
+                    output = stop
+                    # Drop the input frames no later output needs.
+                    first = self.first_input(output)
+                    buffer = buffer[first - buffer_start:]
+                    buffer_start = first
+            if resampled is not None:
+                yield resampled
+        if output < self.frames_out:
+            with profiler.stage('resample', path):
+                if buffer is None:
+                    buffer = np.zeros(0)
+                resampled = self.filter(buffer, buffer_start, output, self.frames_out)
+            yield resampled
+
+# === Writing =====================================================
+def wav_header(rate, frames, channels, dtype, metadata=b'', trailing_size=0):
+    """
+    Return the header scipy.io.wavfile.write gives samples of this layout, up to the data chunk's contents.
+
+    metadata (whole chunks) goes before the data chunk; trailing_size bytes of chunks are to follow it.
+    """
+    dtype = np.dtype(dtype)
+    is_float = dtype.kind == 'f'
+    bits = dtype.itemsize * 8
+    block_align = channels * dtype.itemsize
+    fmt = struct.pack('<HHIIHH', WAVE_FORMAT_IEEE_FLOAT if is_float else WAVE_FORMAT_PCM,
+                      channels, rate, rate * block_align, block_align, bits)
+    if is_float:
+        # cbSize of non-PCM formats
+        fmt += b'\x00\x00'
+    data_size = frames * block_align
+    size = 4 + 8 + len(fmt) + (12 if is_float else 0) + len(metadata) + 8 + data_size + trailing_size
+    if size > 0xFFFFFFFF:
+        # The ds64 chunk (36 bytes) holds the sizes that do not fit in 32 bits.
+        header = (b'RF64' + b'\xFF\xFF\xFF\xFF' + b'WAVE' + b'ds64' + struct.pack('<I', 28)
+                  + struct.pack('<QQQI', size + 36, data_size, frames, 0))
+    else:
+        header = b'RIFF' + struct.pack('<I', size) + b'WAVE'
+    header += b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+    if is_float:
+        header += b'fact' + struct.pack('<II', 4, frames)
+    return header + metadata + b'data' + struct.pack('<I', min(data_size, 0xFFFFFFFF))
+
+# === Metadata Chunks =============================================
+def scale_frame(position, source_rate, rate):
+    """
+    Return the frame at rate that is at the time of frame position at source_rate, rounded to the nearest.
+    """
+    return (position * rate * 2 + source_rate) // (source_rate * 2)
+
+def adjust_chunk(chunk_id, payload, source_rate, rate):
+    """
+    Return the payload of a metadata chunk for a file at rate: 'smpl' and 'cue ' frame positions are
+    rescaled from source_rate, everything else is kept as is.
+    """
+    if rate == source_rate:
+        return payload
+    payload = bytearray(payload)
+    if chunk_id == b'smpl' and len(payload) >= 36:
+        # Sample period in nanoseconds, then the loops: (cue id, type, start, end, fraction, play count).
+        struct.pack_into('<I', payload, 8, round(1e9 / rate))
+        num_loops = struct.unpack_from('<I', payload, 28)[0]
+        for pos in range(36, min(36 + num_loops * 24, len(payload) - 23), 24):
+            start, end = struct.unpack_from('<II', payload, pos + 8)
+            # end is the last frame of the loop, so the loop's length is scaled with it.
+            new_start = scale_frame(start, source_rate, rate)
+            new_end = max(new_start, scale_frame(end + 1, source_rate, rate) - 1)
+            struct.pack_into('<II', payload, pos + 8, new_start, new_end)
+    elif chunk_id == b'cue ' and len(payload) >= 4:
+        # Cue points: (id, position, data chunk id, chunk start, block start, sample offset).
+        num_points = struct.unpack_from('<I', payload, 0)[0]
+        for pos in range(4, min(4 + num_points * 24, len(payload) - 23), 24):
+            position = struct.unpack_from('<I', payload, pos + 4)[0]
+            sample_offset = struct.unpack_from('<I', payload, pos + 20)[0]
+            struct.pack_into('<I', payload, pos + 4, scale_frame(position, source_rate, rate))
+            struct.pack_into('<I', payload, pos + 20, scale_frame(sample_offset, source_rate, rate))
+    return bytes(payload)
+
+def read_chunks(f, chunks, source_rate, rate):
+    """
+    Return the given metadata chunks of an open source file as bytes, ready to write (see adjust_chunk).
+    """
+    parts = []
+    for chunk_id, offset, size, _ in chunks:
+        f.seek(offset)
+        payload = adjust_chunk(chunk_id, f.read(size), source_rate, rate)
+        parts.append(chunk_id + struct.pack('<I', len(payload)) + payload + b'\x00' * (len(payload) % 2))
+    return b''.join(parts)
+
+def write_lite(source, output_path, rng, requantize_other=True, peak_value=None, keep_metadata=True, rate=None,
+               block_frames=BLOCK_FRAMES, profiler=NO_PROFILER):
+    """
+    Convert a source to its lite version at rate (default: the source's) and write it to output_path in
+    one sequential pass (two for an int32 source whose peak_value is not given), with the source's
+    metadata chunks unless keep_metadata is False.
+
+    An unfinished output is removed if the conversion fails.
+    """
+    rate = rate or source.rate
+    dtype = lite_dtype(source, requantize_other, rate)
+    _, channels = mono_layout(source)
+    frames = resampled_frames(source.frames, source.rate, rate)
+    blocks = iter_lite_blocks(source, rng, requantize_other, peak_value, rate, block_frames, profiler, output_path)
+    metadata = trailing = b''
+    if keep_metadata and source.chunks:
+        with open(source.path, 'rb') as f:
+            before = [chunk for chunk in source.chunks if chunk[3]]
+            after = [chunk for chunk in source.chunks if not chunk[3]]
+            metadata = read_chunks(f, before, source.rate, rate)
+            trailing = read_chunks(f, after, source.rate, rate)
+    data_size = frames * channels * dtype.itemsize
+    if trailing and data_size % 2:
+        # The data chunk is padded to an even size before the chunks that follow it.
+        trailing = b'\x00' + trailing
+    try:
+        with open(output_path, 'wb') as f:
+            f.write(wav_header(rate, frames, channels, dtype, metadata, len(trailing)))
+            for block in blocks:
+                with profiler.stage('encode', output_path) as record:
+                    data = block.astype(dtype.newbyteorder('<'), copy=False).tobytes()
+                    f.write(data)
+                    record['bytes_written'] += len(data)
+            f.write(trailing)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+# === Peak Index ==================================================
+class PeakIndex:
+    """
+    Peaks of source files (see scan_peak) by absolute path, kept in a JSON sidecar.
+
+    An entry is used as long as its file keeps the size and modification time it was scanned with.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.changed = False
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            # A missing or damaged index is rebuilt.
+            pass
+
+    def stale(self, paths):
+        """
+        Return the paths whose peak is not in the index or was scanned from another version of the file.
+        """
+        stale_paths = []
+        for path in paths:
+            entry = self.entries.get(os.path.abspath(path))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not entry or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns:
+                stale_paths.append(path)
+        return stale_paths
+
+    def add(self, path, peak_value):
+        """
+        Record the peak of a file (None if it is not normalized) as of its current size and modification time.
+        """
+        st = os.stat(path)
+        self.entries[os.path.abspath(path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'peak': peak_value}
+        self.changed = True
+
+    def peak(self, path):
+        """
+        Return the recorded peak of a file, or None.
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        return entry['peak'] if entry else None
+
+    def save(self):
+        """
+        Write the index if it changed, replacing the old one atomically.
+        """
+        if not self.changed:
+            return
+        temp_path = f"{self.path}.partial"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.changed = False
+
+def normalization_peaks(index, paths, mode='file'):
+    """
+    Return the peak each of paths is normalized to, by path, for the files the index has a peak for.
+
+    In 'file' mode that is the file's own peak; in 'instrument' mode, the highest peak of the files
+    of paths in the same folder.
+    """
+    if mode not in NORMALIZE_MODES:
+        raise ValueError(f"unknown normalize mode '{mode}' (expected one of {', '.join(NORMALIZE_MODES)})")
+    peaks = {path: index.peak(path) for path in paths}
+    peaks = {path: peak_value for path, peak_value in peaks.items() if peak_value is not None}
+    if mode == 'instrument':
+        folder_peaks = {}
+        for path, peak_value in peaks.items():
+            folder = os.path.dirname(os.path.abspath(path))
+            folder_peaks[folder] = max(folder_peaks.get(folder, 0.0), peak_value)
+        peaks = {path: folder_peaks[os.path.dirname(os.path.abspath(path))] for path in peaks}
+    return peaks
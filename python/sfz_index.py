@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+sfz_index.py
+
+Tokenizer and opcode index for SFZ files, used by full-lite-workflow.py to point instruments at the
+WAVs a run produced.
+
+An SFZ file is read as a stream of tokens (comments, <headers>, #define, #include and opcode=value),
+with the position of each in the file's text, so it can be rewritten in place without touching
+anything else. Resolving a top-level file follows the way samplers read it:
+  - #define $NAME value applies to everything after it, in included files too, and $NAME is replaced
+    in opcode names and values;
+  - #include "file" reads the file in place, relative to the top-level file's folder;
+  - sample paths are relative to the top-level file's folder and the <control> header's default_path,
+    with '\\' as well as '/' between folders;
+  - opcodes of <global>, <master> and <group> headers apply to the headers below them.
+
+The tokens of each file are memoized by path, size and modification time, so a file included by many
+instruments is read and tokenized once per run.
+
+Usage:
+    index = SfzIndex()
+    edits = index.plan_edits(sfz_path, produced)   # {file: [(start, end, replacement), ...]}
+    text = apply_edits(index.text(sfz_path), edits.get(os.path.abspath(sfz_path), []))
+"""
+
+import os                # For resolving paths.
+import re                # For the tokenizer.
+from collections import namedtuple
+
+from lite_wav import scale_frame
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>//[^\r\n]*|/\*.*?\*/)
+  | <(?P<header>[A-Za-z_]\w*)>
+  | \#define[ \t]+(?P<define>\$\w+)[ \t]+(?P<define_value>[^\r\n]*?)[ \t]*(?=//|\r|\n|$)
+  | \#include[ \t]+"(?P<include>[^"\r\n]*)"
+  | (?P<opcode>[A-Za-z0-9_$]+)=(?P<value>(?:(?!\s+[A-Za-z0-9_$]+=|\s*<|\s*//)[^\r\n])*)
+  | (?P<space>\s+)
+  | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+DEFINE_NAME = re.compile(r'\$\w+')
+
+# Headers whose opcodes apply to the headers below them, from the outermost.
+HEADER_LEVELS = {'global': 0, 'master': 1, 'group': 2, 'region': 3}
+# Opcodes giving a position in sample frames, which follow their sample when it is resampled.
+FRAME_OPCODES = re.compile(r'(offset|offset_random|offset_oncc\d+|delay_samples|delay_samples_oncc\d+|end|'
+                           r'loop_start|loopstart|loop_end|loopend)$', flags=re.IGNORECASE)
+# Of those, the ones naming the last frame of a span, which are scaled with the span's length.
+LAST_FRAME_OPCODES = ('end', 'loop_end', 'loopend')
+# Other names of the same opcodes.
+OPCODE_ALIASES = {'loopstart': 'loop_start', 'loopend': 'loop_end'}
+
+# A token: kind ('header', 'define', 'include' or 'opcode'), name (header or opcode name, define
+# variable) and value (opcode or define value, include path), value_start and value_end giving where
+# the value is in the file's text (the value without trailing blanks; the whole <header> for headers).
+Token = namedtuple('Token', 'kind name value value_start value_end')
+
+def iter_tokens(text):
+    """
+    Yield the tokens of an SFZ file's text in order, skipping comments and blanks.
+    """
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'header':
+            yield Token('header', match.group('header').lower(), None, match.start(), match.end())
+        elif kind == 'define_value':
+            yield Token('define', match.group('define'), match.group('define_value'),
+                        match.start('define_value'), match.end('define_value'))
+        elif kind == 'include':
+            yield Token('include', None, match.group('include'), match.start('include'), match.end('include'))
+        elif kind == 'value':
+            value = match.group('value').rstrip()
+            start = match.start('value')
+            yield Token('opcode', match.group('opcode'), value, start, start + len(value))
+
+def expand_defines(text, defines):
+    """
+    Replace the $NAMEs of text defined in defines with their values.
+    """
+    if '$' not in text:
+        return text
+    return DEFINE_NAME.sub(lambda m: defines.get(m.group(0), m.group(0)), text)
+
+def apply_edits(text, edits):
+    """
+    Return text with the (start, end, replacement) edits applied.
+    """
+    parts = []
+    position = 0
+    for start, end, replacement in sorted(edits):
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+def rescale_position(value, name, source_rate, rate):
+    """
+    Return the literal frame position value of opcode name for a sample resampled from source_rate to rate.
+    """
+    position = int(value)
+    if name in LAST_FRAME_OPCODES:
+        return str(max(0, scale_frame(position + 1, source_rate, rate) - 1))
+    return str(scale_frame(position, source_rate, rate))
+
+def lite_name(path, suffix):
+    """
+    Return path with suffix inserted before its extension.
+    """
+    base, ext = os.path.splitext(path)
+    return f"{base}{suffix}{ext}"
+
+def lite_reference(value, expanded, suffix):
+    """
+    Return the value of an opcode or #include naming a file, renamed to the file's lite name.
+
+    The value is kept as written if it ends with the file name's extension after anything but a $NAME
+    (which the suffix would run into); otherwise the expanded name is written out in full.
+    """
+    base, extension = os.path.splitext(value)
+    if extension and extension.lower() == os.path.splitext(expanded)[1].lower() \
+            and not DEFINE_NAME.fullmatch(base[base.rfind('$'):]):
+        return lite_name(value, suffix)
+    return lite_name(expanded, suffix)
+
+class SfzIndex:
+    """
+    Tokens of SFZ files, memoized by path, size and modification time.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def load(self, path):
+        """
+        Return (text, tokens) of an SFZ file, reading and tokenizing it only if it changed since last time.
+        """
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        cached = self.files.get(key)
+        if cached and cached[0] == (st.st_size, st.st_mtime_ns):
+            return cached[1], cached[2]
+        with open(key, 'r', encoding='utf-8') as f:
+            text = f.read()
+        tokens = list(iter_tokens(text))
+        self.files[key] = ((st.st_size, st.st_mtime_ns), text, tokens)
+        return text, tokens
+
+    def text(self, path):
+        """
+        Return the text of an SFZ file.
+        """
+        return self.load(path)[0]
+
+    def resolve(self, root_path):
+        """
+        Read a top-level SFZ file and its includes and return (scopes, includes).
+
+        scopes has a dict per header: 'header' (its name), 'token' ((file, header token)), 'parent' (the
+        scope its opcodes are inherited from, or None), 'sample' ((file, token, resolved path, expanded
+        value) or None) and 'positions' ([(file, token, opcode name)]). includes lists (file, token, included file, expanded path) for
+        every #include read.
+        """
+        root_path = os.path.abspath(root_path)
+        root_dir = os.path.dirname(root_path)
+        defines = {}
+        default_path = ''
+        scopes = []
+        includes = []
+        active = [None] * len(HEADER_LEVELS)
+        scope = None
+        in_control = False
+        stack = []
+
+        def walk(path):
+            nonlocal default_path, scope, in_control
+            stack.append(path)
+            _, tokens = self.load(path)
+            for token in tokens:
+                if token.kind == 'define':
+                    defines[token.name] = token.value
+                elif token.kind == 'include':
+                    target = os.path.normpath(os.path.join(root_dir, expand_defines(token.value, defines)
+                                                           .replace('\\', '/')))
+                    # A file including itself, directly or not, is read once.
+                    if target not in stack and os.path.isfile(target):
+                        includes.append((path, token, target, expand_defines(token.value, defines)))
+                        walk(target)
+                elif token.kind == 'header':
+                    in_control = token.name == 'control'
+                    level = HEADER_LEVELS.get(token.name)
+                    if level is None:
+                        # <control>, <curve>, <effect>, <midi>, <sample>...: not region opcodes.
+                        scope = None
+                        continue
+                    parent = next((active[i] for i in range(level - 1, -1, -1) if active[i]), None)
+                    scope = {'header': token.name, 'token': (path, token), 'parent': parent, 'sample': None,
+                             'positions': []}
+                    scopes.append(scope)
+                    active[level:] = [scope] + [None] * (len(active) - level - 1)
+                else:
+                    name = expand_defines(token.name, defines).lower()
+                    if in_control and name == 'default_path':
+                        default_path = expand_defines(token.value, defines).replace('\\', '/')
+                    elif scope is None:
+                        continue
+                    elif name == 'sample':
+                        sample = expand_defines(token.value, defines)
+                        resolved = os.path.normpath(os.path.join(root_dir, default_path, sample.replace('\\', '/')))
+                        scope['sample'] = (path, token, resolved, sample)
+                    elif FRAME_OPCODES.match(name):
+                        scope['positions'].append((path, token, name))
+            stack.pop()
+
+        walk(root_path)
+        return scopes, includes
+
+    def plan_edits(self, root_path, produced, suffix='_lite'):
+        """
+        Return the edits pointing a top-level SFZ file and its includes at the produced WAVs, by file.
+
+        produced maps the absolute path of every WAV produced in the run to (source_rate, rate). Only the
+        samples found in it are renamed with suffix, and the frame positions using them are rescaled if
+        their rate changed. A position set on a <global>, <master> or <group> follows the samples of the
+        regions below it that use it: it is rescaled if they all changed rate alike, and otherwise each
+        resampled region gets its own rescaled copy. An included file with edits is to be written under its lite
+        name (see lite_name), and the #include reading it is edited to match. Returns
+        {absolute file path: [(start, end, replacement)]}, and the root file always has an entry.
+        """
+        scopes, includes = self.resolve(root_path)
+        edits = {os.path.abspath(root_path): {}}
+
+        def edit(path, token, replacement):
+            # A file read twice (e.g. included twice) gets the first edit of each token.
+            edits.setdefault(path, {}).setdefault((token.value_start, token.value_end), replacement)
+
+        inserts = {}
+
+        def insert(path, position, opcode):
+            # Opcodes added right after a header; a header read twice gets each once.
+            opcodes = inserts.setdefault((path, position), [])
+            if opcode not in opcodes:
+                opcodes.append(opcode)
+
+        def chain(scope):
+            while scope:
+                yield scope
+                scope = scope['parent']
+
+        def rate_change(scope):
+            # (source_rate, rate) of the sample in effect for a header if it was resampled, else None.
+            owner = next((owner for owner in chain(scope) if owner['sample']), None)
+            rates = produced.get(owner['sample'][2]) if owner else None
+            return tuple(rates) if rates and rates[0] != rates[1] else None
+
+        def setter(region, name):
+            # The header whose value of an opcode a region uses.
+            name = OPCODE_ALIASES.get(name, name)
+            return next((scope for scope in chain(region)
+                         if any(OPCODE_ALIASES.get(n, n) == name for _, _, n in scope['positions'])), None)
+
+        # The regions below each <global>, <master> and <group>.
+        regions_below = {id(scope): [] for scope in scopes}
+        for region in scopes:
+            if region['header'] == 'region':
+                for scope in chain(region['parent']):
+                    regions_below[id(scope)].append(region)
+
+        for scope in scopes:
+            sample = scope['sample']
+            if sample and sample[2] in produced:
+                path, token, _, expanded = sample
+                edit(path, token, lite_reference(token.value, expanded, suffix))
+            for path, token, name in scope['positions']:
+                if not token.value.isdigit():
+                    continue
+                # A position set above the regions follows the samples of the regions using it.
+                users = [region for region in regions_below[id(scope)] if setter(region, name) is scope]
+                changes = {rate_change(user) for user in users or [scope]}
+                if len(changes) == 1:
+                    change = changes.pop()
+                    if change:
+                        edit(path, token, rescale_position(token.value, name, *change))
+                    continue
+                # Their samples were resampled differently: each resampled one gets its own value.
+                for region in users:
+                    change = rate_change(region)
+                    if change:
+                        header_path, header = region['token']
+                        insert(header_path, header.value_end,
+                               f"{name}={rescale_position(token.value, name, *change)}")
+        for (path, position), opcodes in inserts.items():
+            # Keep the opcodes apart from whatever follows the header.
+            text = ''.join(' ' + opcode for opcode in opcodes)
+            after = self.text(path)[position:position + 1]
+            if after and not after.isspace():
+                text += ' '
+            edits.setdefault(path, {})[(position, position)] = text
+
+        # Files including an edited file are edited too, up to the root.
+        changed = True
+        while changed:
+            changed = False
+            for path, token, target, expanded in includes:
+                if target in edits and (token.value_start, token.value_end) not in edits.get(path, {}):
+                    edit(path, token, lite_reference(token.value, expanded, suffix))
+                    changed = True
+        return {path: [span + (replacement,) for span, replacement in file_edits.items()]
+                for path, file_edits in edits.items()}
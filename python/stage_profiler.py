@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+stage_profiler.py
+
+Per-stage timing and throughput instrumentation shared by the sample scripts (their --profile option).
+
+Each piece of work on a file is wrapped in a named stage (walk, decode, pitch_shift, dither, encode,
+smpl_embed, mono, ...):
+
+    with PROFILER.stage('decode', path) as record:
+        data = f.read()
+        record['bytes_read'] += len(data)
+
+Every stage records wall time, CPU time and the bytes it read and wrote. CPU time includes child
+processes the stage waited for (Rubberband, SoX), so external tools show up in the stage that ran them.
+Repeated stages on the same file (e.g. the blocks of a streamed file) add up in a single record.
+At the end, write_report() saves the per-file records as JSON or CSV and summary() returns a short
+table of totals per stage, including how much of the run's wall time was spent outside every stage.
+
+Stages should not be nested, otherwise their time is counted twice in the totals. CPU time is
+per process, so stages running at the same time on several threads each count the others' CPU too.
+"""
+
+import os                # For process and child CPU times.
+import time              # For wall-clock timing.
+import csv               # For CSV reports.
+import json              # For JSON reports.
+import contextlib        # For the stage context manager.
+import threading         # For recording from several threads.
+
+# Fields of every record, in report order.
+RECORD_FIELDS = ('stage', 'file', 'calls', 'wall_seconds', 'cpu_seconds', 'bytes_read', 'bytes_written')
+
+def cpu_seconds():
+    """
+    Return the CPU time used so far by this process and by the child processes it has waited for.
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+class StageProfiler:
+    """
+    Collect per-stage, per-file timing records. A disabled profiler records nothing.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, file=None, bytes_read=0, bytes_written=0):
+        """
+        Time the body of a with block as stage name of file.
+
+        Yields a dict whose 'bytes_read' and 'bytes_written' the body may add to.
+        """
+        record = {'bytes_read': bytes_read, 'bytes_written': bytes_written}
+        if not self.enabled:
+            yield record
+            return
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield record
+        finally:
+            self.add({'stage': name, 'file': file, 'calls': 1,
+                      'wall_seconds': time.perf_counter() - wall, 'cpu_seconds': cpu_seconds() - cpu,
+                      'bytes_read': record['bytes_read'], 'bytes_written': record['bytes_written']})
+
+    def iterate(self, name, iterable, file=None):
+        """
+        Yield the items of iterable, timing the production of each one as stage name of file.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name, file):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def add(self, record):
+        """
+        Add a record to the totals of its (stage, file).
+        """
+        key = (record['stage'], None if record['file'] is None else os.fsdecode(record['file']))
+        with self.lock:
+            total = self.records.get(key)
+            if total is None:
+                self.records[key] = dict(record, file=key[1])
+                return
+            for field in RECORD_FIELDS[2:]:
+                total[field] += record[field]
+
+    def take(self):
+        """
+        Return the records collected so far and forget them (used to send a worker's records to the parent).
+        """
+        records = list(self.records.values())
+        self.records = {}
+        return records
+
+    def merge(self, records):
+        """
+        Add records taken from another profiler (e.g. a worker process).
+        """
+        for record in records:
+            self.add(record)
+
+    def stage_totals(self):
+        """
+        Return the totals of each stage, in the order the stages were first seen.
+        """
+        totals = {}
+        for record in self.records.values():
+            total = totals.setdefault(record['stage'], {'stage': record['stage'], 'files': 0, 'calls': 0,
+                                                        'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                        'bytes_read': 0, 'bytes_written': 0})
+            total['files'] += 1
+            for field in RECORD_FIELDS[2:]:
+                total[field] += record[field]
+        return list(totals.values())
+
+    def summary(self):
+        """
+        Return a short table of the time, CPU and bytes of each stage, as text.
+        """
+        run_wall = time.perf_counter() - self.started
+        lines = [f"{'Stage':<12} {'Files':>6} {'Calls':>7} {'Wall s':>9} {'CPU s':>9} "
+                 f"{'Read MB':>9} {'Written MB':>10} {'MB/s':>8}"]
+        stage_wall = 0.0
+        for total in self.stage_totals():
+            megabytes = (total['bytes_read'] + total['bytes_written']) / 1e6
+            rate = megabytes / total['wall_seconds'] if total['wall_seconds'] > 0 else 0.0
+            lines.append(f"{total['stage']:<12} {total['files']:>6} {total['calls']:>7} "
+                         f"{total['wall_seconds']:>9.2f} {total['cpu_seconds']:>9.2f} "
+                         f"{total['bytes_read'] / 1e6:>9.1f} {total['bytes_written'] / 1e6:>10.1f} {rate:>8.1f}")
+            stage_wall += total['wall_seconds']
+        lines.append(f"Run wall time {run_wall:.2f} s; {stage_wall:.2f} s in the stages above "
+                     f"(more than the run time when worker processes or threads overlap).")
+        return '\n'.join(lines)
+
+    def write_report(self, path):
+        """
+        Write every per-file record to path: CSV if it ends in .csv, JSON (with stage totals) otherwise.
+        """
+        records = sorted(self.records.values(), key=lambda r: (r['file'] or '', r['stage']))
+        with open(path, 'w', newline='', encoding='utf-8', errors='surrogateescape') as f:
+            if path.lower().endswith('.csv'):
+                writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                json.dump({'run_wall_seconds': time.perf_counter() - self.started,
+                           'stages': self.stage_totals(), 'records': records}, f, indent=2)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+tpdf_dither.py
+
+TPDF dithering and 16-bit quantization shared by the sample scripts.
+
+Audio is dithered with triangular (TPDF) noise of ±1 LSB, rounded, clipped and converted to 16-bit
+PCM. All the work happens in reused float32 buffers of one block at a time, so no full-size float64
+temporaries are made. The noise comes from a NumPy Generator: give each output file its own
+(file_rng derives one from a seed and the file's path under its output root) and the result does not depend on which process
+or in which order the file is produced.
+
+The noise of every sample is drawn in the same order whatever the block size, and the ditherer keeps
+its state between blocks, so a file quantized block by block (streaming) is identical to the same
+file quantized at once.
+
+With shaped=True the noise is first-order highpass TPDF: each sample's noise is the difference of two
+successive uniform draws, which moves the noise power towards high frequencies (a 1 - z^-1 spectrum)
+and needs half as many random numbers.
+
+Usage:
+    ditherer = TPDFDither(file_rng(seed, dst, root=output_root))
+    pcm = ditherer.quantize(y)            # int16 array shaped like y
+"""
+
+import os                # For file names in seeds.
+import zlib              # For deriving per-file seeds.
+
+import numpy as np       # For numerical operations.
+
+# Full-scale value of 16-bit PCM: float samples in [-1, 1) map to [-32768, 32767].
+PCM16_SCALE = 32768.0
+# Number of frames processed at a time by dither_to_pcm16.
+BLOCK_FRAMES = 65536
+
+def file_rng(seed, path, variant=0, root=None):
+    """
+    Return the random generator for the dither noise of one output file.
+
+    With a seed, the generator is derived from the seed, the path of the file relative to root (its
+    name if root is None) and variant (e.g. 1 for a mono copy), so the noise is reproducible across
+    runs, processes and machines, and files of the same name in different folders get different noise.
+    Without a seed it is seeded from the OS.
+    """
+    if seed is None:
+        return np.random.default_rng()
+    name = os.path.relpath(path, root) if root is not None else os.path.basename(path)
+    return np.random.default_rng([seed, zlib.crc32(os.fsencode(name.replace(os.sep, '/'))), variant])
+
+class TPDFDither:
+    """
+    Stateful TPDF ditherer and 16-bit quantizer for one output stream.
+    """
+    def __init__(self, rng=None, shaped=False):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.shaped = shaped
+        self.previous = None
+        self.buffers = {}
+
+    def buffer(self, name, shape):
+        """
+        Return the float32 scratch buffer name with the given shape, reusing it while the shape stays the same.
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self.buffers[name] = np.empty(shape, dtype=np.float32)
+        return buffer
+
+    def noise(self, shape):
+        """
+        Return TPDF noise in LSB units (within ±1) for a block of the given shape.
+
+        The returned buffer is reused by the next call.
+        """
+        noise = self.buffer('noise', shape)
+        if not self.shaped:
+            uniform = self.buffer('uniform', shape + (2,))
+            self.rng.random(dtype=np.float32, out=uniform)
+            np.subtract(uniform[..., 0], uniform[..., 1], out=noise)
+            return noise
+        if len(noise) == 0:
+            return noise
+        if self.previous is None:
+            self.previous = self.rng.random((1,) + shape[1:], dtype=np.float32)
+        uniform = self.buffer('uniform', shape)
+        self.rng.random(dtype=np.float32, out=uniform)
+        np.subtract(uniform[:1], self.previous, out=noise[:1])
+        np.subtract(uniform[1:], uniform[:-1], out=noise[1:])
+        self.previous = uniform[-1:].copy()
+        return noise
+
+    def quantize(self, block, out=None):
+        """
+        Dither, round and clip a block of float audio in [-1, 1] into 16-bit PCM.
+
+        block is not modified. The result is written to out (an int16 array shaped like block) if given.
+        """
+        shape = np.shape(block)
+        scaled = self.buffer('scaled', shape)
+        np.multiply(block, PCM16_SCALE, out=scaled, casting='unsafe')
+        scaled += self.noise(shape)
+        np.rint(scaled, out=scaled)
+        np.clip(scaled, -PCM16_SCALE, PCM16_SCALE - 1, out=scaled)
+        if out is None:
+            out = np.empty(shape, dtype=np.int16)
+        np.copyto(out, scaled, casting='unsafe')
+        return out
+
+def dither_to_pcm16(y, rng=None, shaped=False, block_frames=BLOCK_FRAMES):
+    """
+    Dither and quantize a whole float signal to 16-bit PCM, block_frames frames at a time.
+    """
+    ditherer = TPDFDither(rng, shaped)
+    pcm = np.empty(np.shape(y), dtype=np.int16)
+    for start in range(0, len(y), block_frames):
+        ditherer.quantize(y[start:start+block_frames], out=pcm[start:start+block_frames])
+    return pcm
@@ -1,6 +1,4 @@
 import alpaca_trade_api as tradeapi
-import pandas as pd
-import numpy as np
 
 class MeanReversionBot:
     def __init__(self):
@@ -1,8 +1,6 @@
 #!/usr/bin/env python3
 
 import os
-import alpaca_trade_api as tradeapi
-import pandas as pd
 from datetime import datetime
 
 # -----------------------
@@ -26,11 +24,20 @@ api_key     = os.environ.get("APCA_API_KEY_ID")
 api_secret  = os.environ.get("APCA_API_SECRET_KEY")
 base_url    = os.environ.get("APCA_API_BASE_URL", "https://paper-api.alpaca.markets")
 
-api = tradeapi.REST(
-    key_id=api_key,
-    secret_key=api_secret,
-    base_url=base_url
-)
+# Created on first use, so days without a rebalance never load alpaca_trade_api (slow to import)
+api = None
+
+def get_api():
+    """Returns the Alpaca REST client, creating it on first use."""
+    global api
+    if api is None:
+        import alpaca_trade_api as tradeapi
+        api = tradeapi.REST(
+            key_id=api_key,
+            secret_key=api_secret,
+            base_url=base_url
+        )
+    return api
 
 # -----------------------
 # Utility Functions
@@ -38,21 +45,22 @@ api = tradeapi.REST(
 
 def get_account_info():
     """Fetches Alpaca account info (cash, positions, etc.)."""
-    account = api.get_account()
+    account = get_api().get_account()
     return account
 
 def get_position(symbol):
     """Returns the position object for the given symbol or None if no position."""
+    from alpaca_trade_api.rest import APIError
     try:
-        return api.get_position(symbol)
-    except tradeapi.rest.APIError:
+        return get_api().get_position(symbol)
+    except APIError:
         return None
 
 def place_order(symbol, qty, side, order_type="market", time_in_force="day"):
     """Places a market order with the given parameters."""
     print(f"Placing order: {side} {qty} of {symbol}")
     try:
-        api.submit_order(
+        get_api().submit_order(
             symbol=symbol,
             qty=qty,
             side=side,
@@ -102,7 +110,7 @@ def rebalance_portfolio():
         # Sell the difference (in shares)
         difference = current_stock_value - target_stock_dollars
         # We need the price to convert difference in dollars to shares
-        last_trade = api.get_latest_trade(STOCK_ETF)
+        last_trade = get_api().get_latest_trade(STOCK_ETF)
         current_price = float(last_trade.price)
         shares_to_sell = int(difference // current_price)
         if shares_to_sell > 0:
@@ -110,7 +118,7 @@ def rebalance_portfolio():
     else:
         # Buy the difference
         difference = target_stock_dollars - current_stock_value
-        last_trade = api.get_latest_trade(STOCK_ETF)
+        last_trade = get_api().get_latest_trade(STOCK_ETF)
         current_price = float(last_trade.price)
         shares_to_buy = int(difference // current_price)
         # Ensure we have enough cash
@@ -122,7 +130,7 @@ def rebalance_portfolio():
     if current_bond_value > target_bond_dollars:
         # Sell
         difference = current_bond_value - target_bond_dollars
-        last_trade = api.get_latest_trade(BOND_ETF)
+        last_trade = get_api().get_latest_trade(BOND_ETF)
         current_price = float(last_trade.price)
         shares_to_sell = int(difference // current_price)
         if shares_to_sell > 0:
@@ -130,7 +138,7 @@ def rebalance_portfolio():
     else:
         # Buy
         difference = target_bond_dollars - current_bond_value
-        last_trade = api.get_latest_trade(BOND_ETF)
+        last_trade = get_api().get_latest_trade(BOND_ETF)
         current_price = float(last_trade.price)
         shares_to_buy = int(difference // current_price)
         # Ensure we have enough cash